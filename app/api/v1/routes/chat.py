@@ -1,59 +1,66 @@
 from fastapi import APIRouter, HTTPException, Query, Depends, status
-from app.schemas.chat import ChatMessageCreate, ChatMessageResponse, ModelType
-from app.services.openai_service import get_openai_response
+from fastapi.responses import StreamingResponse
+from app.schemas.chat import ChatMessageCreate, ChatMessageResponse, ModelType, SourceDocument
+from app.services.response_cache import cached_openai_response
+from app.services.model_service import model_service
 from app.services.rag_service import RAGService
-from app.deps import get_current_user
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+from app.services.semantic_cache import rag_response_cache
+from app.services.single_flight import SingleFlight, make_key
+from app.deps import get_current_user, get_rag_service
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, AsyncIterator
+import asyncio
+import logging
+import orjson
 import re
 
-# Create a single shared instance of RAGService
-rag_service = RAGService()
+logger = logging.getLogger(__name__)
 
 router = APIRouter(redirect_slashes=False)
 
+# Concurrent identical RAG queries share one generate_response call
+_rag_flight = SingleFlight()
+
+# Greetings and acknowledgements that never warrant a knowledge-base lookup
+_GREETINGS = frozenset({
+    'hello', 'hi', 'hey', 'greetings',
+    'thanks', 'ok', 'okay'
+})
+
+# A question mark or question word anywhere indicates a knowledge query
+_QUESTION_RE = re.compile(
+    r"\?|\b(?:what|who|when|where|why|how|which|tell me|do you know|can you tell me)\b",
+    re.IGNORECASE
+)
+
 def is_knowledge_query(message: str) -> bool:
     """Determine if a message is a knowledge-base query."""
-    if not message or not message.strip():
+    stripped = message.strip() if message else ""
+    if not stripped:
         return False
-        
-    message_lower = message.lower().strip()
     
+    # Fast paths: explicit questions and messages too short to look up
+    if stripped[-1] == '?':
+        return True
+    if len(stripped) < 3:
+        return False
+        
     # Skip common greetings and simple phrases
-    simple_phrases = [
-        'hello', 'hi', 'hey', 'greetings',
-        'thanks', 'thank you',
-        'ok', 'okay', 'got it'
-    ]
-    
-    if any(phrase in message_lower.split() for phrase in simple_phrases):
+    if not _GREETINGS.isdisjoint(message.lower().split()):
         return False
     
-    # These patterns indicate a knowledge query
-    question_words = [
-        'what', 'who', 'when', 'where', 'why', 'how', 'which', 
-        'tell me', 'do you know', 'can you tell me', 'what is', 'who is'
-    ]
-    
-    # Check for question marks or question words at start of message
-    if ('?' in message or 
-        any(message_lower.startswith(word) for word in question_words)):
-        return True
-        
-    # Check for question words anywhere in the message
-    if any(f' {word} ' in f' {message_lower} ' for word in question_words):
+    # Check for question marks or question words in the message
+    if _QUESTION_RE.search(message):
         return True
         
     # If it's a very short message (1-2 words), it's likely a lookup
-    if len(message.split()) <= 2:
-        return True
-        
-    return False
+    return len(message.split()) <= 2
 
 @router.post("/message", response_model=ChatMessageResponse, status_code=status.HTTP_200_OK)
 async def chat_message(
     message: ChatMessageCreate,
     current_user: Dict[str, Any] = Depends(get_current_user),
+    rag_service: RAGService = Depends(get_rag_service),
     model_type: ModelType = Query(
         ModelType.OPENAI,
         description="The model to use for generating responses"
@@ -79,15 +86,30 @@ async def chat_message(
         if use_rag and is_knowledge_query(message.message):
             try:
                 # Get response from RAG with sources
-                print(f"\n[DEBUG] Sending query to RAG: {message.message}")
-                rag_response = await rag_service.generate_response(
-                    query=message.message,
-                    chat_history=message.chat_history or [],
-                    score_threshold=0.0  # Include all documents, even with low scores
-                )
+                logger.debug("Sending query to RAG: %s", message.message)
+                rag_response = rag_response_cache.lookup_exact(message.message, namespace="chat")
+                if rag_response is None:
+                    # Encoding is CPU-bound; keep it off the event loop
+                    query_embedding = await asyncio.to_thread(rag_service.embed_query, message.message)
+                    rag_response = rag_response_cache.lookup(query_embedding, namespace="chat")
+                if rag_response is None:
+                    rag_response = await _rag_flight.do(
+                        make_key("chat", message.message),
+                        lambda: rag_service.generate_response(
+                            query=message.message,
+                            chat_history=message.chat_history or [],
+                            score_threshold=0.0,  # Include all documents, even with low scores
+                            query_embedding=query_embedding
+                        )
+                    )
+                    # Only cache answers backed by sources; fallbacks after errors are not kept
+                    if rag_response.sources:
+                        rag_response_cache.store(
+                            query_embedding, rag_response, namespace="chat", query=message.message
+                        )
                 
                 # Debug log the RAG response
-                print(f"[DEBUG] RAG Response: {rag_response}")
+                logger.debug("RAG Response: %s", rag_response)
                 
                 # Extract answer and sources from RAG response
                 response_text = rag_response.answer if rag_response.answer else "I couldn't find an answer to your question."
@@ -99,43 +121,36 @@ async def chat_message(
                 )
                 
                 if has_relevant_sources:
-                    sources = [
-                        {
-                            "content": src.get("content", ""),
-                            "source": src.get("source", "unknown"),
-                            "metadata": {
-                                "score": src.get("score", 0.0),
-                                **{k: v for k, v in src.get("metadata", {}).items() 
-                                  if k not in ["source", "score"]}
-                            }
-                        }
-                        for src in rag_response.sources
-                    ]
+                    # RAGService already returns sources in the response shape
+                    sources = rag_response.sources
                     
-                    print(f"[DEBUG] Using RAG response with {len(sources)} sources")
-                    return ChatMessageResponse(
+                    logger.debug("Using RAG response with %d sources", len(sources))
+                    # Built from trusted service output; FastAPI validates the
+                    # response model once on the way out, so skip it here.
+                    return ChatMessageResponse.model_construct(
                         id=1,
                         user=current_user["sub"],  # Use the authenticated user's ID
                         message=response_text,
-                        timestamp=datetime.utcnow(),
+                        timestamp=datetime.now(timezone.utc),
                         model_used=ModelType.RAG.value,
-                        sources=sources
+                        sources=[SourceDocument(**src) for src in sources]
                     )
                 else:
-                    print("[DEBUG] No relevant sources found, falling back to base model")
+                    logger.debug("No relevant sources found, falling back to base model")
                 
             except Exception as e:
-                print(f"[ERROR] RAG query failed: {str(e)}")
+                logger.error("RAG query failed: %s", e, exc_info=True)
         
         # Always use OpenAI for the base model response
-        print(f"[DEBUG] Using OpenAI model for response")
-        response_text = await get_openai_response(message.message)
+        logger.debug("Using OpenAI model for response")
+        response_text = await cached_openai_response(message.message)
             
-        return ChatMessageResponse(
+        # Trusted values; validated once by the route's response_model
+        return ChatMessageResponse.model_construct(
             id=1,
             user=current_user["sub"],  # Use the authenticated user's ID
             message=response_text,
-            timestamp=datetime.utcnow(),
+            timestamp=datetime.now(timezone.utc),
             model_used=model_type.value,
             sources=sources  # Will be empty for base model responses
         )
@@ -145,3 +160,36 @@ async def chat_message(
             status_code=500,
             detail=f"Error processing your request: {str(e)}"
         )
+
+async def _sse_events(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """Frame content deltas as server-sent events, ending with [DONE]."""
+    try:
+        async for chunk in chunks:
+            # JSON-encode so newlines in the text cannot break SSE framing
+            yield b"data: " + orjson.dumps(chunk) + b"\n\n"
+    except Exception as e:
+        logger.error("Streaming response failed: %s", e, exc_info=True)
+        yield b"event: error\ndata: " + orjson.dumps(str(e)) + b"\n\n"
+    yield b"data: [DONE]\n\n"
+
+@router.post("/message/stream", status_code=status.HTTP_200_OK)
+async def chat_message_stream(
+    message: ChatMessageCreate,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    model_type: ModelType = Query(
+        ModelType.OPENAI,
+        description="The model to use for generating responses (local or openai)"
+    )
+):
+    """
+    Stream a base-model response to a chat message as server-sent events.
+    
+    Each event carries a JSON-encoded text delta; the stream ends with
+    "data: [DONE]".
+    """
+    chunks = model_service.stream_response(message.message, model_type=model_type)
+    return StreamingResponse(
+        _sse_events(chunks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
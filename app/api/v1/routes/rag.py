@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
 from fastapi.responses import JSONResponse
 from typing import List, Optional, Dict, Any
+import asyncio
 import os
 import tempfile
 import logging
@@ -11,38 +12,50 @@ logger = logging.getLogger(__name__)
 
 from app.schemas.rag import AddDocumentsRequest, QueryRequest, QueryResponse, DocumentSourceType
 from app.services.rag_service import RAGService
+from app.services.semantic_cache import rag_response_cache
+from app.services.single_flight import SingleFlight, make_key
+from app.deps import get_rag_service
 
 router = APIRouter(redirect_slashes=False)
-rag_service = RAGService()
+
+# Uploads are copied to disk in 1 MiB chunks so memory stays flat for large files
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Concurrent identical queries share one generate_response call
+_rag_flight = SingleFlight()
 
 @router.post("/documents", response_model=dict)
-async def add_documents(request: AddDocumentsRequest):
+async def add_documents(request: AddDocumentsRequest, rag_service: RAGService = Depends(get_rag_service)):
     """
     Add documents to the knowledge base from a file or URLs
     """
     try:
-        rag_service.add_documents(
+        # Ingestion is CPU-bound (chunking + embedding); keep it off the event loop
+        await asyncio.to_thread(
+            rag_service.add_documents,
             file_path=request.file_path,
             urls=[str(url) for url in request.urls] if request.urls else None
         )
+        rag_response_cache.clear()
         return {"status": "success", "message": "Documents added successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/upload", response_model=dict)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(file: UploadFile = File(...), rag_service: RAGService = Depends(get_rag_service)):
     """
     Upload a document file to add to the knowledge base
     """
     try:
         # Create temp file
         with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
             temp_file_path = temp_file.name
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                temp_file.write(chunk)
         
         # Add to knowledge base
-        rag_service.add_documents(file_path=temp_file_path)
+        await asyncio.to_thread(rag_service.add_documents, file_path=temp_file_path)
+        rag_response_cache.clear()
         
         # Clean up
         os.unlink(temp_file_path)
@@ -54,35 +67,40 @@ async def upload_document(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/query", response_model=QueryResponse)
-async def query_knowledge_base(request: QueryRequest):
+async def query_knowledge_base(request: QueryRequest, rag_service: RAGService = Depends(get_rag_service)):
     """
     Query the knowledge base with a question and return answer with sources
     """
     try:
-        # Get response from RAG service with sources
-        rag_response = await rag_service.generate_response(
-            query=request.query,
-            chat_history=request.chat_history,
-            top_k=4,  # Number of documents to retrieve
-            score_threshold=0.5  # Minimum similarity score
-        )
-        
-        # Convert sources to the expected format
-        sources = [
-            {
-                "content": src.get("content", ""),
-                "source": src.get("source", "unknown"),
-                "metadata": {
-                    **src.get("metadata", {}),
-                    "score": src.get("score", 0.0)
-                }
-            }
-            for src in rag_response.sources
-        ]
+        # Reuse the answer to an identical or near-duplicate query when one is cached
+        rag_response = rag_response_cache.lookup_exact(request.query, namespace="query")
+        if rag_response is None:
+            # Encoding is CPU-bound; keep it off the event loop
+            query_embedding = await asyncio.to_thread(rag_service.embed_query, request.query)
+            rag_response = rag_response_cache.lookup(query_embedding, namespace="query")
+        if rag_response is None:
+            # Get response from RAG service with sources
+            rag_response = await _rag_flight.do(
+                make_key("query", request.query),
+                lambda: rag_service.generate_response(
+                    query=request.query,
+                    chat_history=request.chat_history,
+                    top_k=4,  # Number of documents to retrieve
+                    score_threshold=0.5,  # Minimum similarity score
+                    query_embedding=query_embedding
+                )
+            )
+            # Only cache answers backed by sources; fallbacks after errors are not kept
+            if rag_response.sources:
+                rag_response_cache.store(
+                    query_embedding, rag_response, namespace="query", query=request.query
+                )
         
-        return QueryResponse(
+        # Sources already carry content, source and metadata (including score);
+        # the response_model validates this once, so skip validation here
+        return QueryResponse.model_construct(
             answer=rag_response.answer,
-            sources=sources
+            sources=rag_response.sources
         )
     except Exception as e:
         logger.error(f"Error querying knowledge base: {str(e)}", exc_info=True)
@@ -1,55 +1,64 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends, status
 from typing import Dict, Any
 from app.schemas.user import UserCreate, UserInDB, UserResponse, UserLogin, Token
-from app.services.mongo_service import create_user, get_user_by_id, get_all_users, delete_user_by_id, get_user_by_username, get_user_by_login
+from app.services.mongo_service import create_user, get_user_by_id, get_all_users, delete_user_by_id, get_user_by_login, user_exists, PUBLIC_USER_PROJECTION
 from app.services.jwt_service import create_access_token
-from datetime import datetime
+from datetime import datetime, timezone
 from app.deps import get_current_user
+from app.core.config import BCRYPT_ROUNDS
 from passlib.context import CryptContext
 
 router = APIRouter(redirect_slashes=False)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=BCRYPT_ROUNDS, deprecated="auto")
+
+# Verified against when the login is unknown so both paths cost one bcrypt round.
+# Hashing it at import also resolves the bcrypt backend before the first login.
+_DUMMY_HASH = pwd_context.hash("dummy-password")
+
+async def verify_password(password: str, hashed: str) -> bool:
+    # bcrypt is CPU-bound; run it in the default executor to keep the event loop free
+    return await asyncio.get_running_loop().run_in_executor(None, pwd_context.verify, password, hashed)
+
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(None, pwd_context.hash, password)
 
 @router.post("/login", response_model=Token)
 async def login(user: UserLogin):
     db_user = await get_user_by_login(user.login)
-    if not db_user or not pwd_context.verify(user.password, db_user["password"]):
+    hashed = db_user["password"] if db_user else _DUMMY_HASH
+    if not await verify_password(user.password, hashed) or not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = create_access_token({"sub": db_user["id"]})
     return {"access_token": token, "token_type": "bearer"}
 
 @router.post("/register", response_model=Token)
 async def register_user(user: UserCreate):
-    # Check if username already exists
-    if await get_user_by_username(user.username):
+    # Check if username or email already exists
+    username_taken, email_taken = await user_exists(user.username, user.email)
+    if username_taken:
         raise HTTPException(status_code=400, detail="Username already created")
-    # Check if email already exists
-    if await get_user_by_login(user.email):
+    if email_taken:
         raise HTTPException(status_code=400, detail="Email already created")
-    user_data = user.dict()
-    now = datetime.utcnow()
+    user_data = user.model_dump()
+    now = datetime.now(timezone.utc)
     user_data["createdAt"] = now
     user_data["modifiedAt"] = now
-    user_data["password"] = pwd_context.hash(user_data["password"])
+    user_data["password"] = await hash_password(user_data["password"])
     inserted_id = await create_user(user_data)
     token = create_access_token({"sub": inserted_id})
     return {"access_token": token, "token_type": "bearer"}
 
 @router.get("/users", response_model=list[UserResponse], dependencies=[Depends(get_current_user)])
 async def list_users():
-    users = await get_all_users()
-    # Remove password from each user
-    for user in users:
-        user.pop("password", None)
-    return users
+    return await get_all_users(projection=PUBLIC_USER_PROJECTION)
 
 @router.get("/users/{user_id}", response_model=UserResponse, dependencies=[Depends(get_current_user)])
 async def get_user(user_id: str):
-    user = await get_user_by_id(user_id)
+    user = await get_user_by_id(user_id, projection=PUBLIC_USER_PROJECTION)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    user.pop("password", None)
     return user
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(get_current_user)])
@@ -62,12 +71,11 @@ async def delete_user(user_id: str):
 @router.get("/me", response_model=UserResponse)
 async def read_current_user(current_user: Dict[str, Any] = Depends(get_current_user)):
 
-    user = await get_user_by_id(current_user["sub"])
+    # Password is excluded server-side by the projection
+    user = await get_user_by_id(current_user["sub"], projection=PUBLIC_USER_PROJECTION)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    # Remove sensitive information
-    user.pop("password", None)
     return user
@@ -1,30 +1,37 @@
 import os
-from dotenv import load_dotenv
+from app.core.env import load_env
 
 # Load environment variables from .env file
-load_dotenv()
+load_env()
 
 # MongoDB Configuration
+# Connection pool options are set on the client in mongo_service; do not add
+# conflicting maxPoolSize/minPoolSize/maxIdleTimeMS parameters to the URI.
 MONGO_URI = os.getenv("MONGO_URI")
 
 if not MONGO_URI:
     raise ValueError("MONGO_URI is not set in environment variables")
 
-# Add tlsAllowInvalidCertificates to the connection string for development
-if "tlsAllowInvalidCertificates" not in MONGO_URI:
-    if "?" in MONGO_URI:
-        MONGO_URI += "&tlsAllowInvalidCertificates=true"
-    else:
-        MONGO_URI += "?tlsAllowInvalidCertificates=true"
+# Parse the URI once; MongoDB option names are case-insensitive
+from urllib.parse import urlparse, parse_qsl
+parsed_uri = urlparse(MONGO_URI)
+_uri_options = {key.lower(): value for key, value in parse_qsl(parsed_uri.query)}
+
+# Allow invalid TLS certificates for development unless the URI says otherwise.
+# Passed to the client as a keyword argument rather than spliced into the URI.
+MONGO_TLS_ALLOW_INVALID_CERTIFICATES = (
+    _uri_options.get("tlsallowinvalidcertificates", "true").lower() == "true"
+)
 
 # Extract database name from the URI if needed
-from urllib.parse import urlparse
-parsed_uri = urlparse(MONGO_URI)
 MONGO_DB_NAME = parsed_uri.path.strip('/') or 'chat_aug'
 
 # JWT Configuration
 JWT_SECRET = os.getenv("JWT_SECRET", "supersecretjwtkey")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 
+# Password hashing cost; lower it (minimum 4) only for local development and tests
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")  # Keep your OpenAI API key in .env file
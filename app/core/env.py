@@ -0,0 +1,9 @@
+from functools import cache
+
+from dotenv import load_dotenv
+
+
+@cache
+def load_env() -> None:
+    """Load variables from the project .env file, once per process."""
+    load_dotenv()
@@ -1,6 +1,7 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.services.jwt_service import decode_access_token
+from app.services.rag_service import RAGService
 
 bearer_scheme = HTTPBearer()
 
@@ -14,3 +15,7 @@ def get_current_user(token: HTTPAuthorizationCredentials = Depends(bearer_scheme
             detail=str(e),
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+def get_rag_service(request: Request) -> RAGService:
+    """Return the shared RAGService created during application startup."""
+    return request.app.state.rag
@@ -1,34 +1,61 @@
+import asyncio
 from fastapi import FastAPI, Request, HTTPException, status, APIRouter
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from typing import Callable, Awaitable, Any, List, Dict
-import os
+import orjson
 from pathlib import Path
 from fastapi.routing import APIRoute
+from contextlib import asynccontextmanager
 
 from app.api.v1.routes import chat, rag
 from app.api.v1.routes import user
+from app.services.rag_service import RAGService
+from app.services.http_clients import close_http_clients, open_http_clients
+from app.services.mongo_service import ensure_indexes
+from app.middleware import AllowAllCORSMiddleware
 
-app = FastAPI(title="Chat API", redirect_slashes=False)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create data directory if it doesn't exist
+    Path("data/vector_store").mkdir(parents=True, exist_ok=True)
+    # Build indexes in the background so an unreachable MongoDB doesn't hold up startup
+    index_task = asyncio.create_task(ensure_indexes())
+    open_http_clients()
+    # Build the RAG pipeline once per process and load the embedder before serving
+    app.state.rag = RAGService()
+    await app.state.rag.warmup()
+    yield
+    index_task.cancel()
+    await close_http_clients()
 
-# Allow all origins for development. Restrict in production!
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+
+app = FastAPI(
+    title="Chat API",
+    redirect_slashes=False,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+
+# Allow all origins for development. Restrict in production!
+app.add_middleware(AllowAllCORSMiddleware)
+
 # Include routers
 app.include_router(chat.router, prefix="/api/v1/chat", tags=["chat"])
 app.include_router(rag.router, prefix="/api/v1/rag", tags=["rag"])
 app.include_router(user.router, prefix="/api/v1/user", tags=["user"])
 
-# Create data directory if it doesn't exist
-os.makedirs("data/vector_store", exist_ok=True)
+# Static health payload, encoded once at import
+_HEALTH_BYTES = orjson.dumps({
+    "status": "healthy",
+    "version": "1.0.0",
+    "services": {
+        "api": "operational",
+        "database": "connected"  # Add more detailed checks as needed
+    }
+})
 
 @app.get("/api/v1/health", status_code=200, tags=["health"])
 async def health_check():
@@ -36,12 +63,5 @@ async def health_check():
     Health check endpoint for the application.
     Returns 200 OK if the application is running.
     """
-    return {
-        "status": "healthy",
-        "version": "1.0.0",
-        "services": {
-            "api": "operational",
-            "database": "connected"  # Add more detailed checks as needed
-        }
-    }
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
 # NOTE: Route is defined as "/" (no trailing slash), so prefix should not end with a slash.
@@ -1,9 +1,9 @@
-from datetime import datetime
-from pydantic import BaseModel
+from datetime import datetime, timezone
+from pydantic import BaseModel, Field
 
 # For demo, using Pydantic as model; replace with SQLAlchemy for DB
 class ChatMessage(BaseModel):
     id: int
     user: str
     message: str
-    timestamp: datetime = datetime.utcnow()
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
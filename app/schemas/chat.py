@@ -1,5 +1,6 @@
+from dataclasses import dataclass
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from typing import Optional
 
@@ -12,14 +13,19 @@ class ChatMessageCreate(BaseModel):
     user: str
     message: str
     model_type: Optional[ModelType] = ModelType.OPENAI  # Changed default to OPENAI
-    chat_history: Optional[list] = []
+    chat_history: Optional[list] = Field(default_factory=list)
 
-class SourceDocument(BaseModel):
+# Plain slotted dataclass: built from trusted RAG output on every response, so it
+# skips model overhead; pydantic still validates it as a response field.
+@dataclass(slots=True)
+class SourceDocument:
     content: str
     source: str
     metadata: Optional[dict] = None
 
 class ChatMessageResponse(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     id: int
     user: str
     message: str
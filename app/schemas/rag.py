@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, ConfigDict, HttpUrl
 from typing import List, Optional
 from enum import Enum
 
@@ -15,5 +15,7 @@ class QueryRequest(BaseModel):
     chat_history: Optional[List[dict]] = None
 
 class QueryResponse(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     answer: str
     sources: List[dict]
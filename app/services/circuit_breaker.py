@@ -0,0 +1,55 @@
+"""
+Circuit breaker for calls to flaky upstream services.
+
+After ``fail_max`` consecutive failures the circuit opens and calls are
+rejected immediately. Once ``reset_timeout`` seconds have passed a single
+trial call is let through: success closes the circuit, failure keeps it open
+for another ``reset_timeout``.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with timed trial calls."""
+
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Return whether a call may proceed right now."""
+        if self._opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self._opened_at < self.reset_timeout:
+            return False
+        # Let this call through as the trial; others wait another timeout
+        self._opened_at = now
+        return True
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("Circuit '%s' closed", self.name)
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._opened_at is not None:
+            # Failed trial: stay open for another full timeout
+            self._opened_at = time.monotonic()
+        elif self._failures >= self.fail_max:
+            self._opened_at = time.monotonic()
+            logger.warning(
+                "Circuit '%s' opened after %d consecutive failures", self.name, self._failures
+            )
@@ -1,9 +1,9 @@
-from typing import List, Optional, Union, Dict, Any, Tuple
+from typing import List, Optional, Union, Dict, Any, Tuple, Callable, Iterator
 from pathlib import Path
 import json
 import yaml
 import re
-import requests
+import httpx
 from urllib.parse import urlparse
 from langchain_text_splitters import RecursiveCharacterTextSplitter, RecursiveJsonSplitter
 from langchain_community.document_loaders import (
@@ -14,15 +14,28 @@ from langchain_community.document_loaders import (
 from langchain_core.documents import Document
 import os
 import logging
-from dotenv import load_dotenv
-from datetime import datetime
+from app.core.env import load_env
+from datetime import datetime, timezone
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
-load_dotenv()
+load_env()
+
+# Maximum number of URLs fetched concurrently during ingestion
+URL_LOAD_WORKERS = 8
+
+# Shared keep-alive client for fetching documents by URL (safe to use across threads)
+_http_client = httpx.Client(
+    timeout=30,
+    follow_redirects=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=URL_LOAD_WORKERS)
+)
 
 # Common phrases to remove from documents
 BOILERPLATE_PHRASES = [
@@ -53,21 +66,24 @@ HEADER_FOOTER_PATTERNS = [
     r'^\s*section [\d\.]+\s*$',  # Section headers
 ]
 
+# Each pattern list compiled once into a single alternation
+_BOILERPLATE_RE = re.compile("|".join(f"(?:{p})" for p in BOILERPLATE_PHRASES), re.IGNORECASE)
+_HEADER_FOOTER_RE = re.compile("|".join(f"(?:{p})" for p in HEADER_FOOTER_PATTERNS), re.MULTILINE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
 def clean_text(text: str) -> str:
     """Clean and preprocess text content."""
     if not text:
         return ""
     
     # Remove common boilerplate
-    for phrase in BOILERPLATE_PHRASES:
-        text = re.sub(phrase, '', text, flags=re.IGNORECASE)
+    text = _BOILERPLATE_RE.sub('', text)
     
     # Remove headers/footers
-    for pattern in HEADER_FOOTER_PATTERNS:
-        text = re.sub(pattern, '', text, flags=re.MULTILINE)
+    text = _HEADER_FOOTER_RE.sub('', text)
     
     # Clean up whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _WHITESPACE_RE.sub(' ', text).strip()
     
     return text
 
@@ -99,43 +115,79 @@ class DocumentProcessor:
                 "",         # No separator (fallback)
             ]
         )
+        
+        # Loader dispatch tables keyed by lowercase file extension
+        self._file_loaders: Dict[str, Callable[[str], List[Document]]] = {
+            '.pdf': lambda path: PyPDFLoader(path).load(),
+            '.json': self._load_json_file,
+            '.yaml': self._load_yaml_file,
+            '.yml': self._load_yaml_file,
+            '.md': lambda path: UnstructuredMarkdownLoader(path).load(),
+            '.docx': lambda path: Docx2txtLoader(path).load(),
+        }
+        self._url_loaders: Dict[str, Callable[[str], List[Document]]] = {
+            '.pdf': lambda url: PyPDFLoader(url).load(),
+            '.yaml': self._load_yaml_url,
+            '.yml': self._load_yaml_url,
+            '.json': self._load_json_url,
+            '.txt': lambda url: TextLoader(url).load(),
+            '.md': lambda url: TextLoader(url).load(),
+        }
 
-    def _load_pdf(self, file_path: str) -> List[Document]:
-        """Load and process PDF files with improved extraction."""
+    def _iter_pdf_pages(self, file_path: str) -> Iterator[Document]:
+        """
+        Yield raw PDF pages one at a time, preferring PyPDFium2.
+        
+        If PyPDFium2 fails on any page, the rest of the file is read with
+        PyPDFLoader, resuming at the page that failed.
+        """
+        pages_read = 0
         try:
-            # Try PyPDFium2 first for better text extraction
-            try:
-                loader = PyPDFium2Loader(file_path)
-                docs = loader.load()
-            except Exception as e:
-                logger.warning(f"PyPDFium2 failed, falling back to PyPDFLoader: {str(e)}")
-                loader = PyPDFLoader(file_path, extract_images=False)
-                docs = loader.load()
-            
-            # Clean and process each document
-            processed_docs = []
-            for doc in docs:
-                # Clean the content
-                cleaned_content = clean_text(doc.page_content)
-                if not cleaned_content.strip():
-                    continue
-                    
-                # Update document with cleaned content and metadata
-                doc.page_content = cleaned_content
-                doc.metadata.update({
-                    "source": file_path,
-                    "file_name": os.path.basename(file_path),
-                    "file_type": "pdf",
-                    "page": doc.metadata.get("page", 0) + 1,  # 1-based page numbers
-                    "last_updated": datetime.utcnow().isoformat()
-                })
+            for page in PyPDFium2Loader(file_path).lazy_load():
+                yield page
+                pages_read += 1
+            return
+        except Exception as e:
+            logger.warning(
+                "PyPDFium2 failed on page %d of %s, falling back to PyPDFLoader: %s",
+                pages_read + 1, file_path, e
+            )
+        
+        fallback_pages = PyPDFLoader(file_path, extract_images=False).lazy_load()
+        yield from islice(fallback_pages, pages_read, None)
+
+    def _iter_cleaned_pdf_pages(self, file_path: str) -> Iterator[Document]:
+        """Yield cleaned PDF pages with sufficient content, one page in memory at a time."""
+        last_updated = datetime.now(timezone.utc).isoformat()
+        file_name = os.path.basename(file_path)
+        for doc in self._iter_pdf_pages(file_path):
+            # clean_text collapses whitespace, so ten spaces means more than ten words
+            cleaned_content = clean_text(doc.page_content)
+            if cleaned_content.count(' ') < 10:
+                continue
                 
-                # Only include documents with sufficient content
-                if len(cleaned_content.split()) > 10:  # At least 10 words
-                    processed_docs.append(doc)
-            
-            return processed_docs
-            
+            # Update document with cleaned content and metadata
+            doc.page_content = cleaned_content
+            doc.metadata.update({
+                "source": file_path,
+                "file_name": file_name,
+                "file_type": "pdf",
+                "page": doc.metadata.get("page", 0) + 1,  # 1-based page numbers
+                "last_updated": last_updated
+            })
+            yield doc
+
+    def iter_pdf_chunks(self, file_path: str) -> Iterator[Document]:
+        """
+        Load, clean and split a PDF in a single streaming pass.
+        
+        Each page is cleaned and split as soon as it is read, so neither the
+        raw nor the cleaned page list is ever materialized.
+        """
+        try:
+            for page in self._iter_cleaned_pdf_pages(file_path):
+                for chunk in self.text_splitter.split_text(page.page_content):
+                    yield Document(page_content=chunk, metadata=dict(page.metadata))
         except Exception as e:
             logger.error(f"Error loading PDF {file_path}: {str(e)}")
             raise ValueError(f"Failed to process PDF: {str(e)}")
@@ -160,6 +212,7 @@ class DocumentProcessor:
             
             # Clean and process documents
             processed_docs = []
+            last_updated = datetime.now(timezone.utc).isoformat()
             for doc in docs:
                 cleaned_content = clean_text(doc.page_content)
                 if cleaned_content.strip():
@@ -168,7 +221,7 @@ class DocumentProcessor:
                         "source": file_path,
                         "file_name": os.path.basename(file_path),
                         "file_type": "json",
-                        "last_updated": datetime.utcnow().isoformat()
+                        "last_updated": last_updated
                     })
                     processed_docs.append(doc)
             
@@ -198,7 +251,7 @@ class DocumentProcessor:
                         "source": file_path,
                         "file_name": os.path.basename(file_path),
                         "file_type": "yaml",
-                        "last_updated": datetime.utcnow().isoformat()
+                        "last_updated": datetime.now(timezone.utc).isoformat()
                     }
                 )]
                 
@@ -207,31 +260,43 @@ class DocumentProcessor:
         except Exception as e:
             raise ValueError(f"Error processing YAML file {file_path}: {str(e)}")
 
+    def _load_text_file(self, file_path: str) -> List[Document]:
+        """Load a plain text file."""
+        return TextLoader(file_path, encoding='utf-8').load()
+
+    def _load_yaml_url(self, url: str) -> List[Document]:
+        """Fetch and normalize a YAML document from a URL."""
+        response = _http_client.get(url)
+        response.raise_for_status()
+        data = yaml.safe_load(response.text)
+        return [Document(page_content=yaml.dump(data), metadata={"source": url})]
+
+    def _load_json_url(self, url: str) -> List[Document]:
+        """Fetch a JSON document from a URL."""
+        response = _http_client.get(url)
+        response.raise_for_status()
+        return [Document(page_content=response.text, metadata={"source": url})]
+
     def _load_url_content(self, url: str) -> List[Document]:
         """Load content from a URL."""
         try:
-            # First try WebBaseLoader for web pages
-            if any(url.endswith(ext) for ext in ['.pdf', '.txt', '.md', '.json', '.yaml', '.yml']):
-                # For direct file URLs, use appropriate loader
-                if url.endswith('.pdf'):
-                    return PyPDFLoader(url).load()
-                elif url.endswith(('.yaml', '.yml')):
-                    response = requests.get(url)
-                    response.raise_for_status()
-                    data = yaml.safe_load(response.text)
-                    return [Document(page_content=yaml.dump(data), metadata={"source": url})]
-                elif url.endswith('.json'):
-                    response = requests.get(url)
-                    response.raise_for_status()
-                    return [Document(page_content=response.text, metadata={"source": url})]
-                else:
-                    return TextLoader(url).load()
-            else:
-                # For web pages, use WebBaseLoader
+            # Direct file URLs use the loader for their extension; web pages use WebBaseLoader
+            ext = Path(urlparse(url).path).suffix.lower()
+            loader = self._url_loaders.get(ext)
+            if loader is None:
                 return WebBaseLoader(url).load()
+            return loader(url)
         except Exception as e:
             raise ValueError(f"Error loading URL {url}: {str(e)}")
 
+    def _load_url_or_skip(self, url: str) -> List[Document]:
+        """Load a URL, logging and skipping it on failure."""
+        try:
+            return self._load_url_content(url)
+        except Exception as e:
+            logger.warning("Error loading URL %s: %s", url, e)
+            return []
+
     def load_documents(self, file_path: str = None, urls: List[str] = None) -> List[Document]:
         """
         Load documents from file path or URLs.
@@ -250,34 +315,30 @@ class DocumentProcessor:
             file_ext = Path(file_path).suffix.lower()
             
             try:
-                if file_ext == '.pdf':
-                    loader = PyPDFLoader(file_path)
-                    documents.extend(loader.load())
-                elif file_ext == '.json':
-                    documents.extend(self._load_json_file(file_path))
-                elif file_ext in ['.yaml', '.yml']:
-                    documents.extend(self._load_yaml_file(file_path))
-                elif file_ext == '.md':
-                    documents.extend(UnstructuredMarkdownLoader(file_path).load())
-                elif file_ext == '.docx':
-                    documents.extend(Docx2txtLoader(file_path).load())
-                else:
-                    # Default to text loader for other file types
-                    documents.extend(TextLoader(file_path, encoding='utf-8').load())
+                # Default to text loader for other file types
+                loader = self._file_loaders.get(file_ext, self._load_text_file)
+                documents.extend(loader(file_path))
             except Exception as e:
                 print(f"Error loading file {file_path}: {str(e)}")
                 raise
             
         if urls:
-            for url in urls:
-                try:
-                    documents.extend(self._load_url_content(url))
-                except Exception as e:
-                    print(f"Error loading URL {url}: {str(e)}")
-                    continue
+            # Fetch URLs concurrently; map() keeps results in input order
+            if len(urls) == 1:
+                documents.extend(self._load_url_or_skip(urls[0]))
+            else:
+                with ThreadPoolExecutor(max_workers=min(URL_LOAD_WORKERS, len(urls))) as pool:
+                    for url_documents in pool.map(self._load_url_or_skip, urls):
+                        documents.extend(url_documents)
                 
         return documents
 
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """Split documents into chunks"""
         return self.text_splitter.split_documents(documents)
+
+
+@lru_cache(maxsize=1)
+def get_document_processor() -> DocumentProcessor:
+    """Return the process-wide DocumentProcessor built from environment settings."""
+    return DocumentProcessor()
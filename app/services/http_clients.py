@@ -0,0 +1,75 @@
+"""
+Shared HTTP clients for model backends.
+
+Clients are opened by the application lifespan and reused by every request
+so connections stay pooled; shutdown closes them. They are (re)created on
+demand, so a later lifespan in the same process (tests, reloads) or a script
+without one gets fresh clients instead of closed ones.
+"""
+from typing import AsyncIterator, Optional
+
+import httpx
+import orjson
+
+LOCAL_MODEL_BASE_URL = "http://localhost:1234"
+OPENAI_BASE_URL = "https://api.openai.com"
+
+_local_model_client: Optional[httpx.AsyncClient] = None
+_openai_client: Optional[httpx.AsyncClient] = None
+
+
+def get_local_model_client() -> httpx.AsyncClient:
+    """Return the pooled client for the local model server."""
+    global _local_model_client
+    if _local_model_client is None or _local_model_client.is_closed:
+        _local_model_client = httpx.AsyncClient(
+            base_url=LOCAL_MODEL_BASE_URL,
+            timeout=httpx.Timeout(300.0, connect=10.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    return _local_model_client
+
+
+def get_openai_client() -> httpx.AsyncClient:
+    """Return the pooled client for the OpenAI API."""
+    global _openai_client
+    if _openai_client is None or _openai_client.is_closed:
+        # HTTP/2 lets concurrent completions share one TLS connection to OpenAI
+        _openai_client = httpx.AsyncClient(
+            base_url=OPENAI_BASE_URL,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100),
+            http2=True
+        )
+    return _openai_client
+
+
+def open_http_clients() -> None:
+    """Create the shared clients up front, at application startup."""
+    get_local_model_client()
+    get_openai_client()
+
+
+async def close_http_clients() -> None:
+    """Close all shared clients and their pooled connections."""
+    global _local_model_client, _openai_client
+    for client in (_local_model_client, _openai_client):
+        if client is not None:
+            await client.aclose()
+    _local_model_client = _openai_client = None
+
+
+async def iter_sse_deltas(response: httpx.Response) -> AsyncIterator[str]:
+    """Yield the content deltas of a streamed chat completion (SSE) response."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data: "):
+            continue
+        data = line[6:]
+        if data == "[DONE]":
+            break
+        choices = orjson.loads(data).get("choices")
+        if not choices:
+            continue
+        content = choices[0].get("delta", {}).get("content")
+        if content:
+            yield content
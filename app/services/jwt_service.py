@@ -1,22 +1,25 @@
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
+import time
+import jwt
 from app.core.config import JWT_SECRET, JWT_ALGORITHM
 
 # 12 hours expiry
 JWT_EXPIRE_HOURS = 12
+_JWT_EXPIRE_SECONDS = JWT_EXPIRE_HOURS * 3600
+
+# HMAC key bytes, encoded once instead of on every sign/verify
+_SECRET_BYTES = JWT_SECRET.encode()
 
 def create_access_token(data: dict) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(hours=JWT_EXPIRE_HOURS)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    # "exp" as integer UNIX seconds, in a new dict so the caller's data is untouched
+    to_encode = {**data, "exp": int(time.time()) + _JWT_EXPIRE_SECONDS}
+    encoded_jwt = jwt.encode(to_encode, _SECRET_BYTES, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
 def decode_access_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, _SECRET_BYTES, algorithms=[JWT_ALGORITHM])
         return payload
     except jwt.ExpiredSignatureError:
         raise Exception('Token expired')
-    except JWTError:
+    except jwt.InvalidTokenError:
         raise Exception('Invalid token')
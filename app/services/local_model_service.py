@@ -1,28 +1,91 @@
+import asyncio
 import httpx
+import orjson
+import random
 import time
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 from fastapi import HTTPException
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+
+from .circuit_breaker import CircuitBreaker
+from .http_clients import get_local_model_client, iter_sse_deltas
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-LOCAL_MODEL_URL = "http://localhost:1234/v1/chat/completions"
+LOCAL_MODEL_PATH = "/v1/chat/completions"
 DEFAULT_TIMEOUT = 300  # 5 minutes for initial response
 MAX_RETRIES = 3
+MAX_CONCURRENT_REQUESTS = 64
+
+# Fail fast while LM Studio is down instead of waiting out timeouts and retries
+local_model_breaker = CircuitBreaker("local_model", fail_max=5, reset_timeout=30)
+# Bulkhead: cap the requests that can be waiting on LM Studio at once
+_local_model_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 
 class LocalModelError(Exception):
     """Custom exception for local model errors"""
     pass
 
-@retry(
-    stop=stop_after_attempt(MAX_RETRIES),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
-    retry=retry_if_exception_type((httpx.RequestError, httpx.HTTPStatusError)),
-    reraise=True
-)
+async def stream_local_model_response(
+    user_message: str,
+    system_message: str = "You are a helpful assistant.",
+    model: str = "llama-3.2-3b-instruct",
+    temperature: float = 0.7,
+    max_tokens: int = 256,
+    timeout: int = DEFAULT_TIMEOUT
+) -> AsyncIterator[str]:
+    """
+    Stream a response from the local LM Studio model as it is generated.
+    
+    Takes the same arguments as get_local_model_response and yields content
+    deltas from the server-sent events; HTTP errors propagate as httpx
+    exceptions.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream"
+    }
+    
+    payload: Dict[str, Any] = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message}
+        ],
+        "temperature": max(0.1, min(1.0, temperature)),  # Clamp between 0.1 and 1.0
+        "max_tokens": max_tokens if max_tokens > 0 else None,
+        "stream": True
+    }
+    
+    if not local_model_breaker.allow():
+        raise HTTPException(status_code=503, detail="Local model unavailable (circuit open)")
+    
+    logger.info("Sending request to local model: %s", model)
+    try:
+        async with _local_model_slots, get_local_model_client().stream(
+            "POST",
+            LOCAL_MODEL_PATH,
+            headers=headers,
+            content=orjson.dumps({k: v for k, v in payload.items() if v is not None}),
+            timeout=httpx.Timeout(timeout, connect=10.0)
+        ) as response:
+            if response.is_error:
+                # Load the body so the error handler can report it
+                await response.aread()
+            # Client errors are ours; only server errors count against LM Studio
+            if response.status_code >= 500:
+                local_model_breaker.record_failure()
+            else:
+                local_model_breaker.record_success()
+            response.raise_for_status()
+            async for content in iter_sse_deltas(response):
+                yield content
+    except httpx.RequestError:
+        local_model_breaker.record_failure()
+        raise
+
 async def get_local_model_response(
     user_message: str,
     system_message: str = "You are a helpful assistant.",
@@ -48,41 +111,36 @@ async def get_local_model_response(
     Raises:
         HTTPException: If there's an error getting a response from the local model
     """
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
-    
-    payload: Dict[str, Any] = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message}
-        ],
-        "temperature": max(0.1, min(1.0, temperature)),  # Clamp between 0.1 and 1.0
-        "max_tokens": max_tokens if max_tokens > 0 else None,
-        "stream": False
-    }
-    
     try:
-        logger.info(f"Sending request to local model: {model}")
+        for attempt in range(MAX_RETRIES):
+            try:
+                content = "".join([
+                    chunk async for chunk in stream_local_model_response(
+                        user_message,
+                        system_message=system_message,
+                        model=model,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=timeout
+                    )
+                ])
+                break
+            except (httpx.RequestError, httpx.HTTPStatusError) as e:
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                # Exponential backoff (4s, 8s, capped at 10s) with jitter to avoid retry storms
+                delay = min(10, 4 * 2 ** attempt) + random.uniform(0, 0.5)
+                logger.warning("Local model request failed (%s), retrying in %.1fs", e, delay)
+                await asyncio.sleep(delay)
         
-        timeout_config = httpx.Timeout(timeout, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout_config) as client:
-            response = await client.post(
-                LOCAL_MODEL_URL,
-                headers=headers,
-                json={k: v for k, v in payload.items() if v is not None}
-            )
-            
-            response.raise_for_status()
-            data = response.json()
+        if not content:
+            raise LocalModelError("Invalid response format from local model")
             
-            if not data.get("choices") or not isinstance(data["choices"], list):
-                raise LocalModelError("Invalid response format from local model")
-                
-            return data["choices"][0]["message"]["content"].strip()
+        return content.strip()
             
+    except HTTPException:
+        raise
+        
     except httpx.HTTPStatusError as e:
         error_msg = f"HTTP error from local model: {e.response.status_code} - {e.response.text}"
         logger.error(error_msg)
@@ -1,26 +1,79 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from app.core.config import MONGO_URI, MONGO_DB_NAME
+from app.core.config import MONGO_URI, MONGO_DB_NAME, MONGO_TLS_ALLOW_INVALID_CERTIFICATES
 from bson import ObjectId
+from pymongo.errors import PyMongoError
+import logging
+import re
 
-# Create a global client and database connection
-client = AsyncIOMotorClient(MONGO_URI)
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Create a global client and database connection with an explicitly sized pool
+client = AsyncIOMotorClient(
+    MONGO_URI,
+    tlsAllowInvalidCertificates=MONGO_TLS_ALLOW_INVALID_CERTIFICATES,
+    maxPoolSize=50,
+    minPoolSize=5,
+    maxIdleTimeMS=60_000,
+    serverSelectionTimeoutMS=3000,
+    retryWrites=True,
+    w="majority"
+)
 db = client[MONGO_DB_NAME]
 users_collection = db["users"]
 
+# 24 hex characters; anything else can never match a stored ObjectId
+_OBJECT_ID_RE = re.compile(r'[0-9a-fA-F]{24}')
+
+# Exactly the UserResponse fields; the password hash and anything else stay on the server
+PUBLIC_USER_PROJECTION = {"username": 1, "email": 1, "createdAt": 1, "modifiedAt": 1}
+
+# Public user documents by id; short-lived so other workers' changes show up quickly
+_user_cache = TTLCache(maxsize=10_000, ttl=10)
+
+# Only the fields the login flow needs: the hash, plus the username to rank matches
+LOGIN_PROJECTION = {"username": 1, "password": 1}
+
+async def ensure_indexes() -> None:
+    """
+    Create the unique lookup indexes used by login and registration.
+
+    The indexes are required for correctness, not just speed: registration
+    checks user_exists before inserting, and only the unique constraint stops
+    two concurrent sign-ups from creating the same username or email.
+    """
+    for field in ("username", "email"):
+        try:
+            await users_collection.create_index(field, unique=True)
+        except PyMongoError as e:
+            logger.error("Could not create unique index on users.%s: %s", field, e)
+
 async def create_user(user_data: dict) -> str:
     result = await users_collection.insert_one(user_data)
     return str(result.inserted_id)
 
-async def get_user_by_id(user_id: str) -> dict | None:
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+async def get_user_by_id(user_id: str, projection: dict | None = None) -> dict | None:
+    if not _OBJECT_ID_RE.fullmatch(user_id):
+        return None
+    # Only password-free reads are cached, so the hash never sits in memory
+    cacheable = projection == PUBLIC_USER_PROJECTION
+    if cacheable:
+        cached = _user_cache.get(user_id)
+        if cached is not None:
+            return dict(cached)
+    user = await users_collection.find_one({"_id": ObjectId(user_id)}, projection)
     if user:
         user["id"] = str(user["_id"])
         user.pop("_id", None)
+        if cacheable:
+            _user_cache.set(user_id, user)
+            return dict(user)
         return user
     return None
 
-async def get_user_by_username(username: str) -> dict | None:
-    user = await users_collection.find_one({"username": username})
+async def get_user_by_username(username: str, projection: dict | None = None) -> dict | None:
+    user = await users_collection.find_one({"username": username}, projection)
     if user:
         user["id"] = str(user["_id"])
         user.pop("_id", None)
@@ -28,23 +81,40 @@ async def get_user_by_username(username: str) -> dict | None:
     return None
 
 async def get_user_by_login(login: str) -> dict | None:
-    user = await users_collection.find_one({"username": login})
-    if not user:
-        user = await users_collection.find_one({"email": login})
+    matches = await users_collection.find(
+        {"$or": [{"username": login}, {"email": login}]},
+        LOGIN_PROJECTION
+    ).to_list(length=2)
+    # A username match wins over another account's email, as before
+    user = next((match for match in matches if match.get("username") == login), None)
+    if user is None and matches:
+        user = matches[0]
     if user:
         user["id"] = str(user["_id"])
         user.pop("_id", None)
         return user
     return None
 
-async def get_all_users() -> list[dict]:
-    users = []
-    async for user in users_collection.find():
-        user["id"] = str(user["_id"])
-        user.pop("_id", None)
-        users.append(user)
+async def user_exists(username: str, email: str) -> tuple[bool, bool]:
+    """Return whether the username and the email are already taken, in one query."""
+    matches = await users_collection.find(
+        {"$or": [{"username": username}, {"email": email}]},
+        {"_id": 0, "username": 1, "email": 1}
+    ).to_list(length=2)
+    username_taken = any(match.get("username") == username for match in matches)
+    email_taken = any(match.get("email") == email for match in matches)
+    return username_taken, email_taken
+
+async def get_all_users(projection: dict | None = None) -> list[dict]:
+    # Large batches keep the number of getMore round-trips low
+    users = await users_collection.find({}, projection).batch_size(1000).to_list(length=None)
+    for user in users:
+        user["id"] = str(user.pop("_id"))
     return users
 
 async def delete_user_by_id(user_id: str) -> bool:
+    if not _OBJECT_ID_RE.fullmatch(user_id):
+        return False
     result = await users_collection.delete_one({"_id": ObjectId(user_id)})
+    _user_cache.pop(user_id)
     return result.deleted_count == 1
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Dict, Any
 from pymongo import MongoClient
 from pymongo.collection import Collection
@@ -6,16 +8,83 @@ from langchain.embeddings.base import Embeddings
 from langchain.schema import Document
 from langchain.vectorstores.base import VectorStore
 from pymongo.operations import UpdateOne
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 import numpy as np
 from pydantic import BaseModel, Field
 from typing import List
 import os
-from dotenv import load_dotenv
+from app.core.env import load_env
 
-load_dotenv()
+load_env()
+
+# Embedding dimensions by (embeddings class, model name), so the probe runs at
+# most once per model however many embeddings objects or stores are built
+_embedding_dimensions: Dict[tuple, int] = {}
+
+def _get_embedding_dimensions(embedding: Embeddings) -> int:
+    """Return the vector size of an embeddings model, embedding a probe only if needed."""
+    dimensions = getattr(embedding, "dimensions", None)
+    if dimensions:
+        return dimensions
+    
+    model_name = getattr(embedding, "model_name", None) or getattr(embedding, "model", None)
+    if not isinstance(model_name, str):
+        # No stable identity to cache under
+        return len(embedding.embed_query("test"))
+    
+    key = (type(embedding).__qualname__, model_name)
+    if key not in _embedding_dimensions:
+        _embedding_dimensions[key] = len(embedding.embed_query("test"))
+    return _embedding_dimensions[key]
+
+# Embedding is CPU/GPU-bound; a small dedicated pool keeps it off the event loop
+# without oversubscribing the model's own BLAS threads
+EMBEDDING_WORKERS = 4
+_embedding_executor: Optional[ThreadPoolExecutor] = None
+
+def _get_embedding_executor() -> ThreadPoolExecutor:
+    """Return the embedding pool, starting it on first async use."""
+    global _embedding_executor
+    if _embedding_executor is None:
+        _embedding_executor = ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS, thread_name_prefix="embedding")
+    return _embedding_executor
+
+# Pool settings for vector store clients; embedding payloads compress well on the wire.
+# Reads stay on the primary so a search sees the texts just added, and pools
+# open connections on demand since every store holds both a sync and an async client.
+MONGO_CLIENT_OPTIONS: Dict[str, Any] = {
+    "maxPoolSize": 200,
+    "waitQueueTimeoutMS": 1000,
+    "compressors": "zstd"
+}
+
+# One client pair per connection string, shared by every store built from it
+_clients: Dict[str, tuple] = {}
+
+def _get_clients(connection_string: str) -> tuple:
+    """Return the cached (MongoClient, AsyncIOMotorClient) for a connection string."""
+    clients = _clients.get(connection_string)
+    if clients is None:
+        clients = (
+            MongoClient(connection_string, **MONGO_CLIENT_OPTIONS),
+            AsyncIOMotorClient(connection_string, **MONGO_CLIENT_OPTIONS)
+        )
+        _clients[connection_string] = clients
+    return clients
+
+# Documents per insert_many call; smaller batches pipeline better than one huge one
+INSERT_BATCH_SIZE = 1000
 
 class MongoDBVectorStore(VectorStore):
-    """MongoDB Vector Store with Atlas Vector Search"""
+    """
+    MongoDB Vector Store with Atlas Vector Search
+
+    Alternative to the local FAISS store for deployments configured with
+    MONGO_URI (see README); the app does not construct it by default.
+
+    The sync methods block on embedding and MongoDB; from async code, await
+    aadd_texts and asimilarity_search instead.
+    """
     
     def __init__(
         self,
@@ -24,9 +93,12 @@ class MongoDBVectorStore(VectorStore):
         index_name: str = "vector_index",
         embedding_key: str = "embedding",
         text_key: str = "text",
-        metadata_key: str = "metadata"
+        metadata_key: str = "metadata",
+        async_collection: Optional[AsyncIOMotorCollection] = None
     ):
         self.collection = collection
+        # Same collection through motor, used by the async methods
+        self.async_collection = async_collection
         self.embedding = embedding
         self.index_name = index_name
         self.embedding_key = embedding_key
@@ -46,10 +118,15 @@ class MongoDBVectorStore(VectorStore):
         **kwargs
     ) -> 'MongoDBVectorStore':
         """Create a MongoDBVectorStore from a connection string"""
-        client = MongoClient(connection_string)
-        db = client[database_name]
-        collection = db[collection_name]
-        return cls(collection=collection, embedding=embedding, **kwargs)
+        client, async_client = _get_clients(connection_string)
+        collection = client[database_name][collection_name]
+        async_collection = async_client[database_name][collection_name]
+        return cls(
+            collection=collection,
+            embedding=embedding,
+            async_collection=async_collection,
+            **kwargs
+        )
     
     def _create_index(self):
         """Create a vector search index if it doesn't exist"""
@@ -57,20 +134,35 @@ class MongoDBVectorStore(VectorStore):
         
         # Check if index already exists
         existing_indexes = self.collection.list_indexes()
-        index_exists = any(index.get("name") == index_name for index in existing_indexes)
+        if any(index.get("name") == index_name for index in existing_indexes):
+            return
         
-        if not index_exists:
-            # Create vector search index
-            self.collection.create_index(
-                [(self.embedding_key, "cosmosSearch")],
-                name=index_name,
-                cosmosSearchOptions={
-                    "kind": "vector-ivf",
-                    "numLists": 1,
-                    "similarity": "COS",
-                    "dimensions": len(self.embedding.embed_query("test"))
-                }
-            )
+        # Create vector search index
+        self.collection.create_index(
+            [(self.embedding_key, "cosmosSearch")],
+            name=index_name,
+            cosmosSearchOptions={
+                "kind": "vector-ivf",
+                "numLists": 1,
+                "similarity": "COS",
+                "dimensions": _get_embedding_dimensions(self.embedding)
+            }
+        )
+    
+    def _build_documents(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[dict]
+    ) -> List[Dict[str, Any]]:
+        return [
+            {
+                self.text_key: text,
+                self.embedding_key: embedding,
+                self.metadata_key: metadata or {}
+            }
+            for text, embedding, metadata in zip(texts, embeddings, metadatas)
+        ]
     
     def add_texts(
         self,
@@ -86,18 +178,43 @@ class MongoDBVectorStore(VectorStore):
         embeddings = self.embedding.embed_documents(texts)
         
         # Prepare documents
-        documents = []
-        for i, (text, embedding, metadata) in enumerate(zip(texts, embeddings, metadatas)):
-            doc = {
-                self.text_key: text,
-                self.embedding_key: embedding,
-                self.metadata_key: metadata or {}
-            }
-            documents.append(doc)
+        documents = self._build_documents(texts, embeddings, metadatas)
+        
+        # Insert in unordered batches so the server can apply each batch in parallel
+        inserted_ids = []
+        for start in range(0, len(documents), INSERT_BATCH_SIZE):
+            result = self.collection.insert_many(
+                documents[start:start + INSERT_BATCH_SIZE],
+                ordered=False
+            )
+            inserted_ids.extend(str(id) for id in result.inserted_ids)
+        return inserted_ids
+    
+    async def aadd_texts(
+        self,
+        texts: List[str],
+        metadatas: Optional[List[dict]] = None,
+        **kwargs
+    ) -> List[str]:
+        """Add texts to the vector store without blocking the event loop on MongoDB"""
+        if self.async_collection is None:
+            return await super().aadd_texts(texts, metadatas, **kwargs)
+        if metadatas is None:
+            metadatas = [{} for _ in texts]
+        
+        embeddings = await asyncio.get_running_loop().run_in_executor(
+            _get_embedding_executor(), self.embedding.embed_documents, texts
+        )
+        documents = self._build_documents(texts, embeddings, metadatas)
         
-        # Insert documents
-        result = self.collection.insert_many(documents)
-        return [str(id) for id in result.inserted_ids]
+        inserted_ids = []
+        for start in range(0, len(documents), INSERT_BATCH_SIZE):
+            result = await self.async_collection.insert_many(
+                documents[start:start + INSERT_BATCH_SIZE],
+                ordered=False
+            )
+            inserted_ids.extend(str(id) for id in result.inserted_ids)
+        return inserted_ids
     
     def similarity_search(
         self, 
@@ -109,8 +226,30 @@ class MongoDBVectorStore(VectorStore):
         # Generate query embedding
         query_embedding = self.embedding.embed_query(query)
         
-        # Vector search pipeline
-        pipeline = [
+        # Execute search
+        results = list(self.collection.aggregate(self._search_pipeline(query_embedding, k)))
+        return self._to_documents(results)
+    
+    async def asimilarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        **kwargs
+    ) -> List[Document]:
+        """Return documents most similar to query, awaiting the search on motor"""
+        if self.async_collection is None:
+            return await super().asimilarity_search(query, k=k, **kwargs)
+        
+        query_embedding = await asyncio.get_running_loop().run_in_executor(
+            _get_embedding_executor(), self.embedding.embed_query, query
+        )
+        cursor = self.async_collection.aggregate(self._search_pipeline(query_embedding, k))
+        results = await cursor.to_list(length=k)
+        return self._to_documents(results)
+    
+    def _search_pipeline(self, query_embedding: List[float], k: int) -> List[Dict[str, Any]]:
+        """Vector search pipeline"""
+        return [
             {
                 "$search": {
                     "cosmosSearch": {
@@ -123,20 +262,17 @@ class MongoDBVectorStore(VectorStore):
             },
             {"$project": {"_id": 0, "text": f"${self.text_key}", "metadata": f"${self.metadata_key}"}}
         ]
-        
-        # Execute search
-        results = list(self.collection.aggregate(pipeline))
-        
-        # Convert to Document objects
-        docs = [
+    
+    @staticmethod
+    def _to_documents(results: List[Dict[str, Any]]) -> List[Document]:
+        """Convert to Document objects"""
+        return [
             Document(
                 page_content=result["text"],
                 metadata=result.get("metadata", {})
             )
             for result in results
         ]
-        
-        return docs
     
     @classmethod
     def from_documents(
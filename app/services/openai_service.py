@@ -1,26 +1,45 @@
-import httpx
+import logging
+from typing import AsyncIterator
+
+import orjson
+
 from app.core.config import OPENAI_API_KEY
+from .http_clients import get_openai_client, iter_sse_deltas
 
-OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
+logger = logging.getLogger(__name__)
 
-async def get_openai_response(user_message: str) -> str:
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
-        "Content-Type": "application/json"
-    }
+OPENAI_CHAT_PATH = "/v1/chat/completions"
+OPENAI_MODEL = "gpt-3.5-turbo"
+
+# Built once; the API key does not change while the process runs
+OPENAI_HEADERS = {
+    "Authorization": f"Bearer {OPENAI_API_KEY}",
+    "Content-Type": "application/json"
+}
+
+async def stream_openai_response(
+    user_message: str,
+    system_message: str = "You are a helpful assistant.",
+    model: str = OPENAI_MODEL
+) -> AsyncIterator[str]:
+    """Yield the completion for a message token by token as OpenAI generates it."""
     payload = {
-        "model": "gpt-3.5-turbo",
+        "model": model,
         "messages": [
-            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "system", "content": system_message},
             {"role": "user", "content": user_message}
         ],
         "max_tokens": 256,
-        "temperature": 0.7
+        "temperature": 0.7,
+        "stream": True
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(OPENAI_API_URL, headers=headers, json=payload, timeout=30)
+    async with get_openai_client().stream("POST", OPENAI_CHAT_PATH, headers=OPENAI_HEADERS, content=orjson.dumps(payload)) as response:
         if response.status_code != 200:
-            print(f"OpenAI API error {response.status_code}: {response.text}")
+            await response.aread()
+            logger.error("OpenAI API error %s: %s", response.status_code, response.text)
             response.raise_for_status()
-        data = response.json()
-        return data["choices"][0]["message"]["content"].strip()
+        async for content in iter_sse_deltas(response):
+            yield content
+
+async def get_openai_response(user_message: str) -> str:
+    return "".join([chunk async for chunk in stream_openai_response(user_message)]).strip()
@@ -1,23 +1,96 @@
+import asyncio
 import logging
 import re
 import os
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from langchain.schema import Document
-from .document_service import DocumentProcessor
+from .document_service import get_document_processor
 from .vector_store_service import VectorStoreService
 from .openai_service import get_openai_response
 from .response_formatter import ResponseFormatter
-from dotenv import load_dotenv
+from app.core.env import load_env
 from pathlib import Path
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
 # Load environment variables
-load_dotenv()
+load_env()
+
+# Documents containing these are copyright notices, metadata or exam material
+_SKIP_PHRASES = (
+    "copyright", "all rights reserved", "document responsibility", 
+    "acknowledgements", "istqb® examination working group",
+    "sample exam", "mock test", "practice test", "exam questions",
+    "answer key", "correct answer", "question bank",
+    "this is a sample", "mock examination", "practice questions",
+    "test your knowledge", "exam preparation"
+)
+# Syllabus content is judged more leniently
+_SYLLABUS_SKIP_PHRASES = tuple(p for p in _SKIP_PHRASES if "sample" not in p and "mock" not in p)
+
+# Body of the first SPECIAL_TEST_INFO block, up to its end marker, the next
+# start marker, or the end of the text
+_SPECIAL_TEST_INFO_RE = re.compile(
+    r"SPECIAL_TEST_INFO_START(.*?)(?:SPECIAL_TEST_INFO_(?:END|START)|\Z)", re.DOTALL
+)
+# Same block, matched in already-lowercased content
+_SPECIAL_TEST_INFO_LOWER_RE = re.compile(
+    r"special_test_info_start(.*?)(?:special_test_info_(?:end|start)|\Z)", re.DOTALL
+)
+
+# Query words that carry no topic - expanded stopwords for ISTQB content
+_STOPWORDS = frozenset({
+    "what", "where", "when", "who", "whom", "which", "whose", "why", "how", 
+    "is", "are", "was", "were", "be", "been", "being", "have", "has", "had", 
+    "do", "does", "did", "will", "would", "shall", "should", "may", "might", 
+    "must", "can", "could", "the", "a", "an", "and", "or", "but", "if", "then", 
+    "else", "when", "at", "from", "by", "on", "off", "for", "in", "out", "over", 
+    "to", "of", "with", "about", "as", "into", "like", "through", "after", "once",
+    "this", "that", "these", "those", "there", "here", "their", "they", "them",
+    "test", "testing", "tester", "testers", "istqb", "foundation", "level", "syllabus",
+    "question", "answer", "explain", "describe", "define", "what's", "what is", "please"
+})
+
+# Query words without surrounding punctuation; internal "-", "." and "'" are
+# kept so "e-commerce", "node.js" and "what's" stay whole
+_QUERY_WORD_RE = re.compile(r"\w(?:[\w.'-]*\w)?")
+
+# Question and answer indicators used to spot question-only documents
+_QUESTION_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'^\s*\d+\.\s*[A-Z]',  # Numbered questions
+    r'\?\s*$',              # Ends with question mark
+    r'\b(what|when|where|why|how|which|who|whom|whose)\b.*\?',  # Question words
+    r'\b(select|choose|identify|which of the following)\b',  # Test question patterns
+    r'\b(a\.|b\.|c\.|d\.|e\.|i\.|ii\.|iii\.|iv\.|v\.)',  # Multiple choice options
+))
+_ANSWER_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'\b(answer|explanation):?\s',
+    r'\b(correct|right|best) (answer|option|choice)',
+    r'\b(because|since|as|due to|therefore|thus|hence)\b',
+))
+
+def _prepare_query(query: str) -> tuple[str, tuple[str, ...]]:
+    """
+    Lowercase a query and extract its meaningful terms, once per request.
+    
+    Returns:
+        The lowercased query and its terms, falling back to every word of three
+        or more characters when all of them are stopwords
+    """
+    query_lower = query.lower().strip() if query else ""
+    words = [word for word in _QUERY_WORD_RE.findall(query_lower) if len(word) > 2]
+    query_terms = tuple(word for word in words if word not in _STOPWORDS)
+    if not query_terms:
+        query_terms = tuple(words)
+    return query_lower, query_terms
 
 class RAGResponse(BaseModel):
+    # Only ever built from the service's own formatter output, so instances are
+    # created with model_construct() and skip validation.
+    model_config = ConfigDict(defer_build=True)
+
     answer: str
     sources: List[Dict[str, Any]]
 
@@ -31,8 +104,8 @@ class RAGService:
         self.embedding_model = embedding_model or os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
         self.index_name = index_name or os.getenv("VECTOR_INDEX_NAME", "default_index")
         
-        # Initialize document processor
-        self.document_processor = DocumentProcessor()
+        # Shared document processor (text splitter is built once per process)
+        self.document_processor = get_document_processor()
         
         # Initialize vector store service with FAISS
         self.vector_store_service = VectorStoreService(
@@ -43,49 +116,43 @@ class RAGService:
         # Minimum score threshold for considering a document relevant
         self.relevance_threshold = 0.7
         
-    def _is_relevant_document(self, doc_content: str, query: str, score: float = 0.0) -> bool:
+    def _is_relevant_document(
+        self,
+        doc_content: str,
+        query_lower: str,
+        query_terms: tuple[str, ...],
+        score: float = 0.0,
+        content_lower: Optional[str] = None
+    ) -> bool:
         """
         Check if a document is relevant to the query based on vector similarity score.
         Prioritizes syllabus content and penalizes question-only documents.
         
         Args:
             doc_content: The content of the document
-            query: The user's query
+            query_lower: The lowercased user query, from _prepare_query
+            query_terms: The query's meaningful terms, from _prepare_query
             score: The similarity score from the vector store (lower is better in FAISS)
+            content_lower: doc_content already lowercased by the caller, if available
             
         Returns:
             bool: True if the document is relevant, False otherwise
         """
+        if content_lower is None:
+            content_lower = doc_content.lower()
+        
         # Special case: Always include syllabus content
-        if "syllabus" in doc_content.lower():
+        is_syllabus = "syllabus" in content_lower
+        if is_syllabus:
             return True
         # Skip empty content or query
-        if not doc_content or not query or not query.strip():
+        if not doc_content or not query_lower:
             return False
-            
-        # Normalize score (in FAISS, lower is better, so we invert it)
-        normalized_score = 1.0 - min(1.0, max(0.0, score))
-        
-        # Convert to lowercase for case-insensitive comparison
-        query_lower = query.lower().strip()
-        content_lower = doc_content.lower()
-        
-        # Skip documents that are just copyright notices or metadata
-        skip_phrases = [
-            "copyright", "all rights reserved", "document responsibility", 
-            "acknowledgements", "istqb® examination working group",
-            "sample exam", "mock test", "practice test", "exam questions",
-            "answer key", "correct answer", "question bank",
-            "this is a sample", "mock examination", "practice questions",
-            "test your knowledge", "exam preparation"
-        ]
         
         # Special handling for syllabus content - be more lenient
-        is_syllabus = "syllabus" in doc_content.lower()
-        if is_syllabus:
-            # Remove some strict filters for syllabus content
-            skip_phrases = [p for p in skip_phrases if "sample" not in p and "mock" not in p]
+        skip_phrases = _SYLLABUS_SKIP_PHRASES if is_syllabus else _SKIP_PHRASES
         
+        # Skip documents that are just copyright notices or metadata
         if any(phrase in content_lower for phrase in skip_phrases):
             return False
             
@@ -93,37 +160,12 @@ class RAGService:
         if "zyxoria" in query_lower:
             return "zyxoria" in content_lower
             
-        # Extract the main content between SPECIAL_TEST_INFO_START/END if it exists
-        if "special_test_info_start" in content_lower:
-            doc_content = content_lower.split("special_test_info_start")[1].split("special_test_info_end")[0]
-        
-        # Clean the query for better matching - expanded stopwords for ISTQB content
-        stopwords = {"what", "where", "when", "who", "whom", "which", "whose", "why", "how", 
-                    "is", "are", "was", "were", "be", "been", "being", "have", "has", "had", 
-                    "do", "does", "did", "will", "would", "shall", "should", "may", "might", 
-                    "must", "can", "could", "the", "a", "an", "and", "or", "but", "if", "then", 
-                    "else", "when", "at", "from", "by", "on", "off", "for", "in", "out", "over", 
-                    "to", "of", "with", "about", "as", "into", "like", "through", "after", "once",
-                    "this", "that", "these", "those", "there", "here", "their", "they", "them",
-                    "test", "testing", "tester", "testers", "istqb", "foundation", "level", "syllabus",
-                    "question", "answer", "explain", "describe", "define", "what's", "what is", "please"}
-        
-        # Extract meaningful terms from query (more aggressive filtering)
-        query_terms = [term.strip('.,!?;:') 
-                      for term in query_lower.split() 
-                      if len(term) > 2 and term not in stopwords]
-        
-        # If no meaningful query terms, be more lenient in matching
-        if not query_terms:
-            query_terms = [term.strip('.,!?;:') 
-                         for term in query_lower.split() 
-                         if len(term) > 2]
-        
         # Check if any query term is in the document content (case-insensitive)
-        matching_terms = sum(1 for term in query_terms if term.lower() in content_lower)
+        matching_terms = sum(1 for term in query_terms if term in content_lower)
+        num_terms = len(query_terms)
         
         # Calculate the actual term ratio (be more lenient with partial matches)
-        term_ratio = matching_terms / max(1, len(query_terms))
+        term_ratio = matching_terms / max(1, num_terms)
         
         # Adjust score based on document length (prefer shorter, more focused documents)
         content_length = len(content_lower.split())
@@ -143,18 +185,9 @@ class RAGService:
             # For other documents, standard weighting
             combined_score = (normalized_score * 0.6 + term_ratio * 0.4 * length_penalty)
         
-        # Debug logging with more details
-        print(f"Document score: {score:.4f} (norm: {normalized_score:.4f}), "
-              f"Term ratio: {term_ratio:.2f} ({matching_terms}/{len(query_terms)}), "
-              f"Length: {content_length} words, "
-              f"Length penalty: {length_penalty:.2f}, "
-              f"Combined: {combined_score:.4f}")
-        print(f"Query terms: {query_terms}")
-        print(f"Content preview: {doc_content[:200]}...")
-        
         # Dynamic threshold based on query length, complexity, and content type
         min_score_threshold = 0.3 if is_syllabus else 0.35
-        if len(query_terms) <= 2:
+        if num_terms <= 2:
             min_score_threshold = 0.4 if is_syllabus else 0.45  # Be more strict with short queries
             
         # Lower threshold for syllabus content
@@ -169,10 +202,23 @@ class RAGService:
             combined_score >= min_score_threshold or 
             term_ratio >= 0.4 or  # Lowered from 0.5 to be more inclusive
             (normalized_score >= 0.75 and term_ratio >= 0.25) or
-            (len(query_terms) <= 2 and term_ratio >= 0.5)  # Be more lenient with very short queries
+            (num_terms <= 2 and term_ratio >= 0.5)  # Be more lenient with very short queries
         )
         
-        print(f"Relevance decision: {is_relevant} (threshold: {min_score_threshold})")
+        # Debug logging with more details, formatted only when enabled
+        if logger.isEnabledFor(logging.DEBUG):
+            # Preview the SPECIAL_TEST_INFO block when there is one
+            special_match = _SPECIAL_TEST_INFO_LOWER_RE.search(content_lower)
+            preview = special_match.group(1) if special_match else doc_content
+            logger.debug(
+                "Document score: %.4f (norm: %.4f), Term ratio: %.2f (%d/%d), "
+                "Length: %d words, Length penalty: %.2f, Combined: %.4f",
+                score, normalized_score, term_ratio, matching_terms, num_terms,
+                content_length, length_penalty, combined_score
+            )
+            logger.debug("Query terms: %s", query_terms)
+            logger.debug("Content preview: %s...", preview[:200])
+            logger.debug("Relevance decision: %s (threshold: %s)", is_relevant, min_score_threshold)
         return is_relevant
 
     def _format_zyxoria_response(self, query: str, relevant_sources: List[Dict]) -> RAGResponse:
@@ -182,14 +228,19 @@ class RAGService:
         
         for doc in relevant_sources:
             content = doc.get("content", "")
+            # The marker contains no whitespace, so docs without it can be skipped
+            # before paying for normalization
+            if "SPECIAL_TEST_INFO_START" not in content:
+                continue
             # Clean up the content by removing extra whitespace and normalizing newlines
             content = ' '.join(content.split())
             
             # Look for the special test info section
-            if "SPECIAL_TEST_INFO_START" in content:
+            special_match = _SPECIAL_TEST_INFO_RE.search(content)
+            if special_match:
                 try:
                     # Extract the special test info section
-                    test_info = content.split("SPECIAL_TEST_INFO_START")[1].split("SPECIAL_TEST_INFO_END")[0]
+                    test_info = special_match.group(1)
                     # Process each line
                     for line in test_info.split('\n'):
                         line = line.strip()
@@ -201,8 +252,8 @@ class RAGService:
                             clean_key = key.replace("WEIRD_ENTRY_", "").strip()
                             if clean_key and value and clean_key not in zyxoria_info:
                                 zyxoria_info[clean_key] = value
-                except Exception as e:
-                    print(f"Error processing document: {e}")
+                except Exception:
+                    logger.exception("Error processing document")
                     continue
         
         if zyxoria_info:
@@ -225,15 +276,23 @@ class RAGService:
                 sources=relevant_sources
             )
             
-            return RAGResponse(
+            return RAGResponse.model_construct(
                 answer=formatted["answer"],
                 sources=relevant_sources
             )
         else:
             # If no specific Zyxoria info was found, use the standard not found response
             formatted = ResponseFormatter.format_not_found_response(query)
-            return RAGResponse(**formatted)
+            return RAGResponse.model_construct(**formatted)
             
+    async def warmup(self) -> None:
+        """Run one dummy embedding so the model is loaded before the first query."""
+        await asyncio.to_thread(self.embed_query, "warmup")
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query with the same model used by the vector store."""
+        return self.vector_store_service.embeddings.embed_query(query)
+
     def add_documents(self, file_path: str = None, urls: List[str] = None) -> int:
         """Add documents to the knowledge base
         
@@ -262,7 +321,8 @@ class RAGService:
         query: str, 
         chat_history: List[Dict[str, str]] = None,
         top_k: int = 6,  # Increased to get more potential matches
-        score_threshold: float = 0.4  # Slightly lower threshold to catch more relevant docs
+        score_threshold: float = 0.4,  # Slightly lower threshold to catch more relevant docs
+        query_embedding: Optional[List[float]] = None
     ) -> Dict[str, Any]:
         """
         Generate a response using RAG with source documents
@@ -272,12 +332,16 @@ class RAGService:
             chat_history: Optional chat history for context
             top_k: Number of relevant documents to retrieve (increased from default)
             score_threshold: Minimum similarity score for documents to be included (slightly lower)
+            query_embedding: The query's embedding, if the caller already computed it
             
         Returns:
             Dict containing 'answer' and 'sources' with document information
         """
         # Retrieve relevant documents with scores
-        relevant_docs = self.vector_store_service.similarity_search(query, k=top_k)
+        relevant_docs = self.vector_store_service.similarity_search(
+            query, k=top_k, embedding=query_embedding
+        )
+        query_lower, query_terms = _prepare_query(query)
         
         # Filter and process documents
         relevant_sources = []
@@ -294,7 +358,8 @@ class RAGService:
             # Check if this document is relevant
             is_relevant = self._is_relevant_document(
                 doc_content=doc_content,
-                query=query,
+                query_lower=query_lower,
+                query_terms=query_terms,
                 score=doc_score
             )
             
@@ -302,23 +367,25 @@ class RAGService:
                 # Add to seen content to avoid duplicates
                 seen_content.add(doc_content)
                 
+                # Source and page are promoted to the top-level source label
+                metadata = dict(doc.metadata)
+                source = metadata.pop('source', 'unknown')
+                page = metadata.pop('page', None)
+                metadata['score'] = doc_score
+
                 # Extract page number if available
-                page_info = f" (page {doc.metadata.get('page', '?')})" if doc.metadata.get('page') else ""
-                
+                page_info = f" (page {page})" if page else ""
+
                 relevant_sources.append({
                     "content": doc_content,
-                    "source": f"{doc.metadata.get('source', 'unknown')}{page_info}",
-                    "metadata": {
-                        **{k: v for k, v in doc.metadata.items() 
-                           if k not in ["source", "page"]},
-                        "score": doc_score
-                    }
+                    "source": f"{source}{page_info}",
+                    "metadata": metadata
                 })
         
         # If we have no relevant content, return a not found response
         if not relevant_sources:
             formatted = ResponseFormatter.format_not_found_response(query)
-            return RAGResponse(**formatted)
+            return RAGResponse.model_construct(**formatted)
         
         # Sort documents by score (highest first)
         relevant_sources.sort(key=lambda x: x["metadata"].get("score", 0), reverse=True)
@@ -328,16 +395,14 @@ class RAGService:
         combined_context = []
         current_length = 0
         
+        # Source contents were stripped and empty ones dropped while filtering
         for doc in relevant_sources:
-            doc_content = doc["content"].strip()
-            if not doc_content:
-                continue
-                
             # Add document with source reference
-            formatted_doc = f"Document from {doc['source']}:\n{doc_content}"
-            
+            formatted_doc = f"Document from {doc['source']}:\n{doc['content']}"
+            doc_length = len(formatted_doc)
+
             # Check if adding this document would exceed our limit
-            if current_length + len(formatted_doc) > max_context_length:
+            if current_length + doc_length > max_context_length:
                 # If we haven't added any content yet, take the beginning of the first doc
                 if not combined_context:
                     remaining_space = max_context_length - current_length - 50  # Leave room for ellipsis
@@ -346,7 +411,7 @@ class RAGService:
                 break
                 
             combined_context.append(formatted_doc)
-            current_length += len(formatted_doc)
+            current_length += doc_length
         
         combined_context = "\n\n---\n\n".join(combined_context)
         
@@ -458,15 +523,15 @@ class RAGService:
                 sources=relevant_sources
             )
             
-            return RAGResponse(
+            return RAGResponse.model_construct(
                 answer=formatted["answer"],
                 sources=relevant_sources
             )
             
         except Exception as e:
-            print(f"Error generating response: {str(e)}")
+            logger.error(f"Error generating response: {str(e)}", exc_info=True)
             formatted = ResponseFormatter.format_not_found_response(query)
-            return RAGResponse(**formatted)
+            return RAGResponse.model_construct(**formatted)
 
     async def _get_relevant_documents(self, query: str, top_k: int = 4) -> List[Dict]:
         """
@@ -482,6 +547,7 @@ class RAGService:
         try:
             # First, try to find syllabus documents specifically
             syllabus_query = f"syllabus {query}"  # Boost syllabus relevance
+            # (doc_dict, lowercased content) pairs; each document is lowercased once
             all_docs = []
             
             # Search for syllabus content first
@@ -492,10 +558,11 @@ class RAGService:
             # Add syllabus docs with priority
             for doc, score in syllabus_docs:
                 doc_dict = doc.dict()
+                content_lower = doc_dict.get("page_content", "").lower()
                 doc_dict["score"] = float(score) * 0.9  # Boost syllabus scores
                 doc_dict["is_syllabus"] = "syllabus" in doc_dict.get("source", "").lower() or \
-                                         "syllabus" in doc_dict.get("page_content", "").lower()
-                all_docs.append(doc_dict)
+                                         "syllabus" in content_lower
+                all_docs.append((doc_dict, content_lower))
             
             # If we didn't find enough syllabus docs, search with original query
             if len(all_docs) < top_k:
@@ -506,17 +573,21 @@ class RAGService:
                     doc_dict = doc.dict()
                     doc_dict["score"] = float(score)
                     doc_dict["is_syllabus"] = False
-                    all_docs.append(doc_dict)
+                    all_docs.append((doc_dict, doc_dict["page_content"].lower()))
             
             # Filter and sort documents
+            query_lower, query_terms = _prepare_query(query)
             processed_docs = []
-            for doc in all_docs:
+            for doc, content_lower in all_docs:
                 # Skip question-only documents (common in test banks)
                 if self._is_question_only(doc["page_content"]):
                     continue
                     
                 # Check document relevance
-                if self._is_relevant_document(doc["page_content"], query, doc["score"]):
+                if self._is_relevant_document(
+                    doc["page_content"], query_lower, query_terms, doc["score"],
+                    content_lower=content_lower
+                ):
                     # Apply syllabus boost
                     if doc.get("is_syllabus"):
                         doc["score"] *= 1.5  # Boost syllabus documents
@@ -550,27 +621,10 @@ class RAGService:
 
     def _is_question_only(self, content: str) -> bool:
         """Check if the content appears to be a question without an answer."""
-        # Common question patterns
-        question_indicators = [
-            r'^\s*\d+\.\s*[A-Z]',  # Numbered questions
-            r'\?\s*$',              # Ends with question mark
-            r'\b(what|when|where|why|how|which|who|whom|whose)\b.*\?',  # Question words
-            r'\b(select|choose|identify|which of the following)\b',  # Test question patterns
-            r'\b(a\.|b\.|c\.|d\.|e\.|i\.|ii\.|iii\.|iv\.|v\.)',  # Multiple choice options
-        ]
-        
-        content = content.lower().strip()
-        
         # If it has multiple question indicators, it's likely a question
-        question_indicators_count = sum(1 for pattern in question_indicators if re.search(pattern, content, re.IGNORECASE))
-        
-        # Check for answer patterns
-        answer_indicators = [
-            r'\b(answer|explanation):?\s',
-            r'\b(correct|right|best) (answer|option|choice)',
-            r'\b(because|since|as|due to|therefore|thus|hence)\b',
-        ]
-        answer_indicators_count = sum(1 for pattern in answer_indicators if re.search(pattern, content, re.IGNORECASE))
-        
-        # If it looks like a question but doesn't contain answers
-        return question_indicators_count >= 2 and answer_indicators_count == 0
+        question_indicators_count = sum(1 for pattern in _QUESTION_PATTERNS if pattern.search(content))
+        if question_indicators_count < 2:
+            return False
+        
+        # It looks like a question; it is question-only if it contains no answers
+        return not any(pattern.search(content) for pattern in _ANSWER_PATTERNS)
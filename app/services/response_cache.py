@@ -0,0 +1,27 @@
+"""
+Exact-match response cache for model completions.
+
+Identical prompts are answered from memory for up to an hour, and concurrent
+requests for the same prompt share a single upstream call.
+"""
+from .openai_service import OPENAI_MODEL, get_openai_response
+from .single_flight import SingleFlight, make_key
+from .ttl_cache import TTLCache
+
+_cache = TTLCache(maxsize=10000, ttl=3600)
+_flight = SingleFlight()
+
+
+async def cached_openai_response(user_message: str) -> str:
+    """Return the OpenAI response for a message, reusing identical recent prompts."""
+    key = make_key(OPENAI_MODEL, user_message)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def fetch() -> str:
+        response = await get_openai_response(user_message)
+        _cache.set(key, response)
+        return response
+
+    return await _flight.do(key, fetch)
@@ -0,0 +1,148 @@
+"""
+Semantic cache for RAG responses keyed on query embeddings.
+
+Near-duplicate queries are matched with random-projection locality-sensitive
+hashing: each table hashes the normalized embedding to a bucket of signed
+hyperplane bits, and candidates sharing a bucket are confirmed with an exact
+cosine check before being returned. Entries are partitioned by an optional
+namespace so callers using different retrieval parameters never share answers.
+
+Entries stored with their query text can also be found by an exact,
+whitespace-normalized match of that text, which lets callers skip embedding
+the query altogether for verbatim repeats.
+"""
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Bounded LRU cache of responses looked up by embedding similarity."""
+
+    def __init__(
+        self,
+        num_tables: int = 8,
+        num_bits: int = 16,
+        threshold: float = 0.95,
+        maxsize: int = 10000,
+        seed: int = 0
+    ):
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._rng = np.random.default_rng(seed)
+
+        # Hyperplanes are created on first use, once the embedding dimension is known
+        self._planes: Optional[np.ndarray] = None
+        self._bit_weights = 1 << np.arange(num_bits, dtype=np.int64)
+        self._tables: List[Dict[tuple, set]] = [{} for _ in range(num_tables)]
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, Tuple[tuple, ...], Optional[tuple], Any]]" = OrderedDict()
+        self._exact: Dict[tuple, int] = {}
+        self._next_id = 0
+
+    def _normalize(self, embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        if self._planes is None:
+            self._planes = self._rng.standard_normal(
+                (self.num_tables, self.num_bits, vector.shape[0])
+            ).astype(np.float32)
+        elif self._planes.shape[2] != vector.shape[0]:
+            return None
+        return vector / norm
+
+    def _signatures(self, vector: np.ndarray, namespace: Hashable) -> Tuple[tuple, ...]:
+        bits = (self._planes @ vector) > 0
+        return tuple((namespace, int(h)) for h in bits.astype(np.int64) @ self._bit_weights)
+
+    @staticmethod
+    def _exact_key(query: str, namespace: Hashable) -> tuple:
+        return (namespace, " ".join(query.split()))
+
+    def lookup_exact(self, query: str, namespace: Hashable = None) -> Optional[Any]:
+        """Return the cached response for the same query text, if any."""
+        entry_id = self._exact.get(self._exact_key(query, namespace))
+        if entry_id is None:
+            return None
+        self._entries.move_to_end(entry_id)
+        return self._entries[entry_id][3]
+
+    def lookup(self, embedding: Sequence[float], namespace: Hashable = None) -> Optional[Any]:
+        """Return the cached response for a near-duplicate query, if any."""
+        if not self._entries:
+            return None
+        vector = self._normalize(embedding)
+        if vector is None:
+            return None
+
+        candidates = set()
+        for table, signature in zip(self._tables, self._signatures(vector, namespace)):
+            candidates.update(table.get(signature, ()))
+
+        best_id, best_score = None, self.threshold
+        for entry_id in candidates:
+            score = float(self._entries[entry_id][0] @ vector)
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            return None
+
+        self._entries.move_to_end(best_id)
+        logger.debug(f"Semantic cache hit (cosine {best_score:.4f})")
+        return self._entries[best_id][3]
+
+    def store(
+        self,
+        embedding: Sequence[float],
+        response: Any,
+        namespace: Hashable = None,
+        query: Optional[str] = None
+    ) -> None:
+        """Cache a response under the given query embedding (and query text)."""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+
+        entry_id = self._next_id
+        self._next_id += 1
+        signatures = self._signatures(vector, namespace)
+        for table, signature in zip(self._tables, signatures):
+            table.setdefault(signature, set()).add(entry_id)
+        exact_key = None
+        if query is not None:
+            exact_key = self._exact_key(query, namespace)
+            # The newest answer wins; the old entry stays reachable by similarity
+            self._exact[exact_key] = entry_id
+        self._entries[entry_id] = (vector, signatures, exact_key, response)
+
+        while len(self._entries) > self.maxsize:
+            self._evict()
+
+    def _evict(self) -> None:
+        entry_id, (_, signatures, exact_key, _) = self._entries.popitem(last=False)
+        if exact_key is not None and self._exact.get(exact_key) == entry_id:
+            del self._exact[exact_key]
+        for table, signature in zip(self._tables, signatures):
+            bucket = table.get(signature)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del table[signature]
+
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        self._tables = [{} for _ in range(self.num_tables)]
+        self._entries.clear()
+        self._exact.clear()
+
+
+# Shared cache for RAG responses across the API routes
+rag_response_cache = SemanticCache()
@@ -0,0 +1,32 @@
+"""
+Coalescing of concurrent identical async calls.
+
+While a call for a given key is in flight, later callers with the same key
+await the same task instead of starting their own.
+"""
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+def make_key(*parts: str) -> bytes:
+    """Build a compact, fixed-size key from string parts."""
+    return hashlib.blake2b("\x00".join(parts).encode(), digest_size=16).digest()
+
+
+class SingleFlight:
+    """Share one in-flight task between concurrent callers of the same key."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled caller does not cancel the shared work
+        return await asyncio.shield(task)
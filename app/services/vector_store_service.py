@@ -2,8 +2,10 @@ from typing import List, Optional, Dict, Any, Union, Iterable
 import os
 import pickle
 import logging
+import threading
+import faiss
 from pathlib import Path
-from dotenv import load_dotenv
+from app.core.env import load_env
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,12 +23,36 @@ except ImportError:
     from langchain.vectorstores import FAISS
 
 # Load environment variables
-load_dotenv()
+load_env()
 
 # Constants
 VECTOR_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'vector_store')
 os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
 
+# Texts per SentenceTransformer.encode forward pass when embedding chunks
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Inference backend for the embedding model: "torch" (default), or "onnx" /
+# "openvino" for faster CPU inference (needs optimum[onnxruntime] / optimum[openvino])
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# Optional model file for the non-torch backends, e.g. a pre-quantized
+# "onnx/model_qint8_avx512.onnx" from the model repository
+EMBEDDING_MODEL_FILE = os.getenv("EMBEDDING_MODEL_FILE")
+
+# Index compression: "none" keeps exact float32 vectors; "int8" stores 8-bit
+# scalar-quantized vectors (4x smaller, approximate L2 distances); "ivfpq"
+# clusters vectors into inverted lists of product-quantized codes, so a query
+# scans only the nearest lists (for large collections)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+
+# Quantizer ranges are trained on the stored vectors, so wait for a usable sample
+MIN_VECTORS_TO_QUANTIZE = 256
+# IVF+PQ needs enough vectors to train its coarse centroids and 256-entry codebooks
+MIN_VECTORS_FOR_IVFPQ = 10_000
+
+# Inverted lists scanned per query with IVF+PQ; the recall/latency knob
+VECTOR_NPROBE = int(os.getenv("VECTOR_NPROBE", "16"))
+
 class VectorStoreService:
     def __init__(
         self,
@@ -38,14 +64,28 @@ class VectorStoreService:
         self.index_name = index_name or os.getenv("VECTOR_INDEX_NAME", "default_index")
         
         # Initialize embeddings with the configured model
+        model_kwargs = {'device': 'cpu'}
+        if EMBEDDING_BACKEND != "torch":
+            model_kwargs['backend'] = EMBEDDING_BACKEND
+            if EMBEDDING_MODEL_FILE:
+                model_kwargs['model_kwargs'] = {'file_name': EMBEDDING_MODEL_FILE}
         self.embeddings = HuggingFaceEmbeddings(
             model_name=self.model_name,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': False}
+            model_kwargs=model_kwargs,
+            encode_kwargs={
+                'normalize_embeddings': False,
+                'batch_size': EMBEDDING_BATCH_SIZE,
+                'show_progress_bar': False
+            }
         )
         
         # Initialize FAISS vector store
         self.vector_store = None
+        # Ingestion runs in worker threads: writers (add, quantize, save) are
+        # serialized, and new stores are only published once fully built
+        self._write_lock = threading.Lock()
+        # Held briefly while the published index is searched or grown in place
+        self._index_lock = threading.Lock()
         self._load_vector_store()
     
     def _load_vector_store(self):
@@ -72,6 +112,9 @@ class VectorStoreService:
             with open(vector_store_path, "rb") as f:
                 self.vector_store = pickle.load(f)
                 
+            if isinstance(getattr(self.vector_store, 'index', None), faiss.IndexIVF):
+                self.vector_store.index.nprobe = VECTOR_NPROBE
+                
             if hasattr(self.vector_store, 'index') and hasattr(self.vector_store.index, 'ntotal'):
                 logger.info(f"Vector store loaded with {self.vector_store.index.ntotal} vectors")
             else:
@@ -98,13 +141,44 @@ class VectorStoreService:
         )
         self._save_vector_store()
     
-    def _save_vector_store(self):
-        """Save the FAISS vector store to disk"""
-        if self.vector_store is None:
+    def _quantize_index(self, vector_store):
+        """Replace an exact flat index with a compressed one, if enabled"""
+        index = vector_store.index
+        if not isinstance(index, faiss.IndexFlat):
+            return
+        
+        if VECTOR_QUANTIZATION == "int8" and index.ntotal >= MIN_VECTORS_TO_QUANTIZE:
+            quantized = faiss.IndexScalarQuantizer(index.d, faiss.ScalarQuantizer.QT_8bit, index.metric_type)
+        elif VECTOR_QUANTIZATION == "ivfpq" and index.ntotal >= MIN_VECTORS_FOR_IVFPQ:
+            nlist = int(4 * index.ntotal ** 0.5)
+            # 4 dimensions per sub-quantizer; if d is not a multiple of 4, use one
+            # sub-quantizer per dimension (m = d)
+            m = index.d // 4 if index.d % 4 == 0 else index.d
+            quantized = faiss.IndexIVFPQ(
+                faiss.IndexFlat(index.d, index.metric_type), index.d, nlist, m, 8, index.metric_type
+            )
+            quantized.nprobe = VECTOR_NPROBE
+        else:
+            return
+        
+        vectors = index.reconstruct_n(0, index.ntotal)
+        quantized.train(vectors)
+        quantized.add(vectors)
+        # Positions are preserved, so index_to_docstore_id stays valid
+        vector_store.index = quantized
+        logger.info(f"Compressed {index.ntotal} vectors ({VECTOR_QUANTIZATION})")
+
+    def _save_vector_store(self, vector_store=None):
+        """Save the FAISS vector store (the published one by default) to disk"""
+        if vector_store is None:
+            vector_store = self.vector_store
+        if vector_store is None:
             logger.warning("Cannot save: vector store is None")
             return False
             
         try:
+            self._quantize_index(vector_store)
+            
             # Ensure the vector store directory exists
             os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
             
@@ -116,7 +190,7 @@ class VectorStoreService:
             
             # Save to temporary file first
             with open(temp_path, "wb") as f:
-                pickle.dump(self.vector_store, f)
+                pickle.dump(vector_store, f)
             
             # Ensure the file was written
             if not os.path.exists(temp_path):
@@ -133,11 +207,11 @@ class VectorStoreService:
                 raise IOError(f"Failed to save vector store to {vector_store_path}")
                 
             logger.info(f"Successfully saved vector store to {vector_store_path}")
-            logger.info(f"Vector store info: {self.vector_store}")
+            logger.info(f"Vector store info: {vector_store}")
             
             # Log some statistics if available
-            if hasattr(self.vector_store, 'index') and hasattr(self.vector_store.index, 'ntotal'):
-                logger.info(f"Vector store contains {self.vector_store.index.ntotal} vectors")
+            if hasattr(vector_store, 'index') and hasattr(vector_store.index, 'ntotal'):
+                logger.info(f"Vector store contains {vector_store.index.ntotal} vectors")
             
             return True
             
@@ -151,11 +225,17 @@ class VectorStoreService:
                     logger.error(f"Error cleaning up temporary file: {str(cleanup_error)}")
             return False
     
-    def add_documents(self, documents: Union[Document, List[Document], Iterable[Document]]) -> None:
+    def add_documents(
+        self,
+        documents: Union[Document, List[Document], Iterable[Document]],
+        save: bool = True
+    ) -> None:
         """Add documents to the vector store.
         
         Args:
             documents: Single document or list/iterable of documents to add
+            save: Whether to persist the store afterwards; bulk loaders adding
+                many batches can pass False and call save() once at the end
         """
         if not documents:
             logger.warning("No documents provided to add_documents")
@@ -174,58 +254,64 @@ class VectorStoreService:
             
         logger.info(f"Adding {len(documents)} documents to vector store")
         
-        try:
-            # Convert documents to texts and metadatas
-            texts = []
-            metadatas = []
-            
-            for doc in documents:
-                if not isinstance(doc, Document):
-                    logger.warning(f"Skipping invalid document type: {type(doc)}")
-                    continue
-                    
-                if not doc.page_content.strip():
-                    logger.warning("Skipping empty document")
-                    continue
+        with self._write_lock:
+            try:
+                # Convert documents to texts and metadatas
+                texts = []
+                metadatas = []
+                
+                for doc in documents:
+                    if not isinstance(doc, Document):
+                        logger.warning(f"Skipping invalid document type: {type(doc)}")
+                        continue
+                        
+                    if not doc.page_content.strip():
+                        logger.warning("Skipping empty document")
+                        continue
+                        
+                    # Ensure metadata is a dictionary
+                    if not hasattr(doc, 'metadata') or not isinstance(doc.metadata, dict):
+                        doc.metadata = {}
                     
-                # Ensure metadata is a dictionary
-                if not hasattr(doc, 'metadata') or not isinstance(doc.metadata, dict):
-                    doc.metadata = {}
+                    # Add source if not present
+                    if 'source' not in doc.metadata:
+                        doc.metadata['source'] = 'unknown'
+                        
+                    texts.append(doc.page_content)
+                    metadatas.append(doc.metadata)
                 
-                # Add source if not present
-                if 'source' not in doc.metadata:
-                    doc.metadata['source'] = 'unknown'
+                if not texts:
+                    logger.warning("No valid texts to add after processing")
+                    return
                     
-                texts.append(doc.page_content)
-                metadatas.append(doc.metadata)
-            
-            if not texts:
-                logger.warning("No valid texts to add after processing")
-                return
+                if self.vector_store is None:
+                    # Create new vector store, published once it is saved
+                    vector_store = FAISS.from_texts(
+                        texts=texts,
+                        embedding=self.embeddings,
+                        metadatas=metadatas
+                    )
+                    logger.info(f"Created new vector store with {len(texts)} documents")
+                    if save:
+                        self._save_vector_store(vector_store)
+                    self.vector_store = vector_store
+                else:
+                    # Embed first so searches are only held up by the insert itself
+                    embeddings = self.embeddings.embed_documents(texts)
+                    with self._index_lock:
+                        self.vector_store.add_embeddings(
+                            text_embeddings=list(zip(texts, embeddings)),
+                            metadatas=metadatas
+                        )
+                    logger.info(f"Added {len(texts)} documents to existing vector store")
+                    
+                    # Save the updated vector store (the write lock is already held)
+                    if save:
+                        self._save_vector_store()
                 
-            if self.vector_store is None:
-                # Create new vector store
-                self.vector_store = FAISS.from_texts(
-                    texts=texts,
-                    embedding=self.embeddings,
-                    metadatas=metadatas
-                )
-                logger.info(f"Created new vector store with {len(texts)} documents")
-            else:
-                # Add documents to existing store
-                self.vector_store.add_texts(
-                    texts=texts,
-                    metadatas=metadatas,
-                    embedding=self.embeddings
-                )
-                logger.info(f"Added {len(texts)} documents to existing vector store")
-            
-            # Save the updated vector store
-            self.save()
-            
-        except Exception as e:
-            logger.error(f"Error adding documents to vector store: {str(e)}")
-            raise
+            except Exception as e:
+                logger.error(f"Error adding documents to vector store: {str(e)}")
+                raise
     
     def save(self) -> bool:
         """Save the current state of the vector store to disk.
@@ -233,7 +319,8 @@ class VectorStoreService:
         Returns:
             bool: True if save was successful, False otherwise
         """
-        return self._save_vector_store()
+        with self._write_lock:
+            return self._save_vector_store()
     
     def create_vector_store(self, documents: List[Document]):
         """Create or update the vector store with new documents
@@ -246,58 +333,61 @@ class VectorStoreService:
             
         logger.info(f"Creating/updating vector store with {len(documents)} documents")
             
-        try:
-            # Convert documents to texts and metadatas
-            texts = []
-            metadatas = []
-            
-            for doc in documents:
-                if not isinstance(doc, Document):
-                    logger.warning(f"Skipping invalid document type: {type(doc)}")
-                    continue
-                    
-                if not doc.page_content.strip():
-                    logger.warning("Skipping empty document")
-                    continue
-                    
-                # Ensure metadata is a dictionary
-                if not hasattr(doc, 'metadata') or not isinstance(doc.metadata, dict):
-                    doc.metadata = {}
+        with self._write_lock:
+            try:
+                # Convert documents to texts and metadatas
+                texts = []
+                metadatas = []
                 
-                # Add source if not present
-                if 'source' not in doc.metadata:
-                    doc.metadata['source'] = 'unknown'
+                for doc in documents:
+                    if not isinstance(doc, Document):
+                        logger.warning(f"Skipping invalid document type: {type(doc)}")
+                        continue
+                        
+                    if not doc.page_content.strip():
+                        logger.warning("Skipping empty document")
+                        continue
+                        
+                    # Ensure metadata is a dictionary
+                    if not hasattr(doc, 'metadata') or not isinstance(doc.metadata, dict):
+                        doc.metadata = {}
                     
-                texts.append(doc.page_content)
-                metadatas.append(doc.metadata)
-            
-            if not texts:
-                logger.warning("No valid texts to process")
+                    # Add source if not present
+                    if 'source' not in doc.metadata:
+                        doc.metadata['source'] = 'unknown'
+                        
+                    texts.append(doc.page_content)
+                    metadatas.append(doc.metadata)
+                
+                if not texts:
+                    logger.warning("No valid texts to process")
+                    return self
+                
+                # Create a new index with the provided documents
+                vector_store = FAISS.from_texts(
+                    texts=texts,
+                    embedding=self.embeddings,
+                    metadatas=metadatas
+                )
+
+                logger.info(f"Created vector store with {len(texts)} documents")
+
+                # Compress and save the new store before searches can see it
+                self._save_vector_store(vector_store)
+                self.vector_store = vector_store
                 return self
-            
-            # Create a new index with the provided documents
-            self.vector_store = FAISS.from_texts(
-                texts=texts,
-                embedding=self.embeddings,
-                metadatas=metadatas
-            )
-            
-            logger.info(f"Created vector store with {len(texts)} documents")
-            
-            # Save the updated vector store
-            self.save()
-            return self
-            
-        except Exception as e:
-            logger.error(f"Error creating vector store: {str(e)}")
-            raise
+                
+            except Exception as e:
+                logger.error(f"Error creating vector store: {str(e)}")
+                raise
     
     def similarity_search(
         self, 
         query: str, 
         k: int = 4,
         filter_dict: Optional[Dict[str, Any]] = None,
-        score_threshold: Optional[float] = None
+        score_threshold: Optional[float] = None,
+        embedding: Optional[List[float]] = None
     ) -> List[Document]:
         """Search for similar documents with enhanced scoring and filtering.
         
@@ -306,11 +396,14 @@ class VectorStoreService:
             k: Maximum number of results to return
             filter_dict: Optional dictionary of metadata filters
             score_threshold: Optional maximum score threshold (lower is better)
+            embedding: The query's embedding, if the caller already computed it
             
         Returns:
             List of matching Document objects with scores in metadata
         """
-        if self.vector_store is None:
+        # Search the store published at call time, even if an ingest replaces it
+        vector_store = self.vector_store
+        if vector_store is None:
             logger.warning("Vector store not initialized")
             return []
             
@@ -318,12 +411,20 @@ class VectorStoreService:
             # Increase k to get more results for better filtering
             fetch_k = min(k * 3, 50)  # Get more results but cap at 50
             
-            # Perform similarity search with scores
-            docs_and_scores = self.vector_store.similarity_search_with_score(
-                query, 
-                k=fetch_k,
-                filter=filter_dict
-            )
+            # Perform similarity search with scores, reusing a precomputed embedding
+            with self._index_lock:
+                if embedding is not None:
+                    docs_and_scores = vector_store.similarity_search_with_score_by_vector(
+                        embedding,
+                        k=fetch_k,
+                        filter=filter_dict
+                    )
+                else:
+                    docs_and_scores = vector_store.similarity_search_with_score(
+                        query,
+                        k=fetch_k,
+                        filter=filter_dict
+                    )
             
             if not docs_and_scores:
                 logger.info("No results found in similarity search")
@@ -382,17 +483,20 @@ class VectorStoreService:
         Returns:
             List of tuples containing (Document, score) pairs
         """
-        if self.vector_store is None:
+        # Search the store published at call time, even if an ingest replaces it
+        vector_store = self.vector_store
+        if vector_store is None:
             logger.warning("Vector store not initialized")
             return []
             
         try:
             # Perform similarity search with scores
-            docs_and_scores = self.vector_store.similarity_search_with_score(
-                query, 
-                k=k,
-                filter=filter_dict
-            )
+            with self._index_lock:
+                docs_and_scores = vector_store.similarity_search_with_score(
+                    query,
+                    k=k,
+                    filter=filter_dict
+                )
             
             if not docs_and_scores:
                 logger.info("No results found in similarity search with scores")
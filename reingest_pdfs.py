@@ -1,9 +1,10 @@
 import os
 import sys
 import logging
+from itertools import islice
 from pathlib import Path
 from dotenv import load_dotenv
-from app.services.document_service import DocumentProcessor
+from app.services.document_service import get_document_processor
 from app.services.vector_store_service import VectorStoreService
 
 # Configure logging
@@ -13,12 +14,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Chunks embedded and added per vector store call while streaming a PDF
+INGEST_BATCH_SIZE = 512
+
 def reingest_pdfs(pdf_dir: str):
     """
     Re-ingest all PDFs from the specified directory using the enhanced document processor.
     """
     # Initialize services
-    doc_processor = DocumentProcessor()
+    doc_processor = get_document_processor()
     vector_store = VectorStoreService()
     
     # Get all PDF files in the directory
@@ -39,26 +43,20 @@ def reingest_pdfs(pdf_dir: str):
         try:
             logger.info(f"Processing PDF: {pdf_file.name}")
             
-            # Load and process the document
-            documents = doc_processor._load_pdf(str(pdf_file))
-            
-            if not documents:
-                logger.warning(f"No content extracted from {pdf_file.name}")
-                continue
-            
-            # Split into chunks
-            chunks = doc_processor.split_documents(documents)
+            # Load, clean and split the document in one streaming pass and add
+            # it in batches, so only one batch of chunks is in memory at a time;
+            # the store is saved once after all files
+            chunks = doc_processor.iter_pdf_chunks(str(pdf_file))
+            total_chunks = 0
+            while batch := list(islice(chunks, INGEST_BATCH_SIZE)):
+                vector_store.add_documents(batch, save=False)
+                total_chunks += len(batch)
             
-            if not chunks:
+            if not total_chunks:
                 logger.warning(f"No valid chunks created from {pdf_file.name}")
                 continue
             
-            logger.info(f"Adding {len(chunks)} chunks to vector store from {pdf_file.name}")
-            
-            # Add to vector store
-            vector_store.add_documents(chunks)
-            
-            logger.info(f"Successfully processed {pdf_file.name}")
+            logger.info(f"Successfully added {total_chunks} chunks from {pdf_file.name}")
             
         except Exception as e:
             logger.error(f"Error processing {pdf_file.name}: {str(e)}", exc_info=True)
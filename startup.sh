@@ -26,5 +26,6 @@ echo -e "\n=== Directory Permissions ==="
 ls -la /app/.cache
 
 # Start the application
+# Each worker loads its own embedding model, so size WEB_CONCURRENCY to available memory
 echo -e "\n=== Starting Application ==="
-exec /usr/local/bin/python -m uvicorn app.main:app --host 0.0.0.0 --port 8000 --proxy-headers
+exec /usr/local/bin/python -m uvicorn app.main:app --host 0.0.0.0 --port 8000 --proxy-headers --loop uvloop --http httptools --workers "${WEB_CONCURRENCY:-1}"
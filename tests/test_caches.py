@@ -0,0 +1,202 @@
+"""
+Unit tests for the in-process caches and request coalescing.
+"""
+import asyncio
+
+import pytest
+
+from app.services import mongo_service, response_cache, ttl_cache
+from app.services.semantic_cache import SemanticCache
+from app.services.single_flight import SingleFlight, make_key
+from app.services.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ttl_cache.time, "monotonic", fake)
+    return fake
+
+
+def test_ttl_cache_entries_expire(clock):
+    cache = TTLCache(maxsize=10, ttl=10)
+    cache.set("key", "value")
+
+    clock.now += 10
+    assert cache.get("key") == "value"
+    clock.now += 0.1
+    assert cache.get("key") is None
+
+
+def test_ttl_cache_set_refreshes_expiry(clock):
+    cache = TTLCache(maxsize=10, ttl=10)
+    cache.set("key", "old")
+    clock.now += 8
+    cache.set("key", "new")
+
+    clock.now += 8
+    assert cache.get("key") == "new"
+
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_pop_and_clear(clock):
+    cache = TTLCache(maxsize=10, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.pop("a")
+    cache.pop("missing")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    cache.clear()
+    assert cache.get("b") is None
+
+
+class FakeUsersCollection:
+    def __init__(self, users):
+        self.users = users
+        self.finds = 0
+
+    async def find_one(self, query, projection=None):
+        self.finds += 1
+        user = self.users.get(query["_id"])
+        return dict(user) if user else None
+
+    async def delete_one(self, query):
+        class Result:
+            deleted_count = int(self.users.pop(query["_id"], None) is not None)
+        return Result()
+
+
+@pytest.mark.asyncio
+async def test_user_cache_is_evicted_on_delete(monkeypatch, clock):
+    user_id = "0123456789abcdef01234567"
+    users = FakeUsersCollection({
+        mongo_service.ObjectId(user_id): {"_id": mongo_service.ObjectId(user_id), "username": "alice"}
+    })
+    monkeypatch.setattr(mongo_service, "users_collection", users)
+    monkeypatch.setattr(mongo_service, "_user_cache", TTLCache(maxsize=10, ttl=10))
+    projection = mongo_service.PUBLIC_USER_PROJECTION
+
+    assert (await mongo_service.get_user_by_id(user_id, projection))["username"] == "alice"
+    assert (await mongo_service.get_user_by_id(user_id, projection))["username"] == "alice"
+    assert users.finds == 1
+
+    assert await mongo_service.delete_user_by_id(user_id)
+    assert await mongo_service.get_user_by_id(user_id, projection) is None
+    assert users.finds == 2
+
+
+def test_semantic_cache_exact_hit_normalizes_whitespace():
+    cache = SemanticCache()
+    cache.store([1.0, 0.0, 0.0], "answer", namespace="chat", query="what is  testing")
+
+    assert cache.lookup_exact("  what is testing ", namespace="chat") == "answer"
+    assert cache.lookup_exact("what is debugging", namespace="chat") is None
+
+
+def test_semantic_cache_near_duplicate_hit():
+    cache = SemanticCache(threshold=0.95)
+    cache.store([1.0, 0.0, 0.0], "answer", namespace="chat")
+
+    assert cache.lookup([0.99, 0.05, 0.0], namespace="chat") == "answer"
+    assert cache.lookup([0.0, 1.0, 0.0], namespace="chat") is None
+
+
+def test_semantic_cache_namespaces_are_isolated():
+    cache = SemanticCache()
+    cache.store([1.0, 0.0, 0.0], "chat answer", namespace="chat", query="q")
+
+    assert cache.lookup([1.0, 0.0, 0.0], namespace="query") is None
+    assert cache.lookup_exact("q", namespace="query") is None
+    assert cache.lookup([1.0, 0.0, 0.0], namespace="chat") == "chat answer"
+
+
+def test_semantic_cache_clear_drops_both_tiers():
+    cache = SemanticCache()
+    cache.store([1.0, 0.0, 0.0], "answer", query="q")
+    cache.clear()
+
+    assert cache.lookup([1.0, 0.0, 0.0]) is None
+    assert cache.lookup_exact("q") is None
+
+
+def test_semantic_cache_evicts_least_recently_used():
+    cache = SemanticCache(maxsize=1)
+    cache.store([1.0, 0.0, 0.0], "first", query="first")
+    cache.store([0.0, 1.0, 0.0], "second", query="second")
+
+    assert cache.lookup_exact("first") is None
+    assert cache.lookup([1.0, 0.0, 0.0]) is None
+    assert cache.lookup_exact("second") == "second"
+
+
+def test_make_key_separates_parts():
+    assert make_key("chat", "q") == make_key("chat", "q")
+    assert make_key("chat", "q") != make_key("query", "q")
+    assert make_key("ab", "c") != make_key("a", "bc")
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_callers():
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "result"
+
+    waiters = [asyncio.create_task(flight.do("key", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == ["result"] * 5
+    assert calls == 1
+    # The finished call is forgotten, so the next one runs again
+    assert await flight.do("key", fetch) == "result"
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_openai_response_reuses_identical_prompts(monkeypatch):
+    calls = []
+
+    async def fake_openai_response(user_message):
+        calls.append(user_message)
+        await asyncio.sleep(0)
+        return f"reply to {user_message}"
+
+    monkeypatch.setattr(response_cache, "get_openai_response", fake_openai_response)
+    monkeypatch.setattr(response_cache, "_cache", response_cache.TTLCache(maxsize=10, ttl=60))
+
+    replies = await asyncio.gather(
+        *(response_cache.cached_openai_response("hello") for _ in range(3))
+    )
+    assert replies == ["reply to hello"] * 3
+    assert await response_cache.cached_openai_response("hello") == "reply to hello"
+    assert await response_cache.cached_openai_response("bye") == "reply to bye"
+    assert calls == ["hello", "bye"]
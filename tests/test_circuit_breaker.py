@@ -0,0 +1,133 @@
+"""
+Unit tests for the circuit breaker and how the local model client feeds it.
+"""
+import httpx
+import pytest
+
+from app.services import circuit_breaker, local_model_service
+from app.services.circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", fake)
+    return fake
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", fail_max=3, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.is_open
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("test", fail_max=2, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert not breaker.is_open
+
+
+def test_half_open_trial_success_closes(clock):
+    breaker = CircuitBreaker("test", fail_max=1, reset_timeout=30)
+    breaker.record_failure()
+
+    clock.now += 29
+    assert not breaker.allow()
+
+    clock.now += 1
+    # One trial call goes through; the rest keep failing fast
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+
+
+def test_half_open_trial_failure_reopens_for_full_timeout(clock):
+    breaker = CircuitBreaker("test", fail_max=1, reset_timeout=30)
+    breaker.record_failure()
+
+    clock.now += 30
+    assert breaker.allow()
+    clock.now += 5
+    breaker.record_failure()
+
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+async def _stream_with(monkeypatch, handler):
+    client = httpx.AsyncClient(
+        base_url="http://local-model", transport=httpx.MockTransport(handler)
+    )
+    monkeypatch.setattr(local_model_service, "get_local_model_client", lambda: client)
+    try:
+        return "".join([
+            chunk async for chunk in local_model_service.stream_local_model_response("hi")
+        ])
+    finally:
+        await client.aclose()
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    fresh = CircuitBreaker("local_model", fail_max=5, reset_timeout=30)
+    monkeypatch.setattr(local_model_service, "local_model_breaker", fresh)
+    return fresh
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status_code, counted", [(500, True), (503, True), (400, False), (422, False)])
+async def test_local_model_http_errors(monkeypatch, breaker, status_code, counted):
+    with pytest.raises(httpx.HTTPStatusError):
+        await _stream_with(monkeypatch, lambda request: httpx.Response(status_code, text="error"))
+
+    assert breaker._failures == (1 if counted else 0)
+
+
+@pytest.mark.asyncio
+async def test_local_model_connection_error_counts(monkeypatch, breaker):
+    def refuse(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    with pytest.raises(httpx.ConnectError):
+        await _stream_with(monkeypatch, refuse)
+
+    assert breaker._failures == 1
+
+
+@pytest.mark.asyncio
+async def test_local_model_success_resets_failures(monkeypatch, breaker):
+    breaker.record_failure()
+    body = 'data: {"choices": [{"delta": {"content": "hello"}}]}\n\ndata: [DONE]\n\n'
+
+    content = await _stream_with(
+        monkeypatch,
+        lambda request: httpx.Response(
+            200, text=body, headers={"Content-Type": "text/event-stream"}
+        )
+    )
+
+    assert content == "hello"
+    assert breaker._failures == 0
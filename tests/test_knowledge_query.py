@@ -0,0 +1,56 @@
+"""
+Tests for routing chat messages to the knowledge base.
+"""
+import pytest
+
+from app.api.v1.routes.chat import _GREETINGS, _QUESTION_RE, is_knowledge_query
+
+
+@pytest.mark.parametrize("message, expected", [
+    # Empty input
+    ("", False),
+    ("   ", False),
+    (None, False),
+    # Trailing question mark
+    ("What is regression testing?", True),
+    ("boundary values?  ", True),
+    # Question words
+    ("Tell me about equivalence partitioning", True),
+    ("how to write a test plan", True),
+    # Greetings and acknowledgements
+    ("hello there", False),
+    ("ok", False),
+    ("Thanks for the help", False),
+    # Short lookups
+    ("Regression", True),
+    ("state transition", True),
+    ("I like static analysis a lot", False),
+])
+def test_is_knowledge_query(message, expected):
+    assert is_knowledge_query(message) is expected
+    # Classification the fast paths left unchanged
+    assert _is_knowledge_query_before_fast_paths(message) is expected
+
+
+def _is_knowledge_query_before_fast_paths(message):
+    """is_knowledge_query as it was before the "?" and length fast paths."""
+    if not message or not message.strip():
+        return False
+    if not _GREETINGS.isdisjoint(message.lower().split()):
+        return False
+    if _QUESTION_RE.search(message):
+        return True
+    return len(message.split()) <= 2
+
+
+@pytest.mark.parametrize("message, before, after", [
+    # A trailing "?" now wins over a greeting
+    ("hi there, what?", False, True),
+    ("ok ?", False, True),
+    # Under three characters is never a lookup, even as a one-word message
+    ("qa", True, False),
+    ("ui", True, False),
+])
+def test_is_knowledge_query_fast_path_changes(message, before, after):
+    assert _is_knowledge_query_before_fast_paths(message) is before
+    assert is_knowledge_query(message) is after
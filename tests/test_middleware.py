@@ -0,0 +1,57 @@
+"""
+Tests for the development CORS middleware.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware import AllowAllCORSMiddleware
+
+ORIGIN = "http://localhost:3000"
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+    app.add_middleware(AllowAllCORSMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_preflight_is_answered_directly(client):
+    response = client.options("/ping", headers={
+        "Origin": ORIGIN,
+        "Access-Control-Request-Method": "POST",
+        "Access-Control-Request-Headers": "authorization, content-type",
+    })
+
+    assert response.status_code == 204
+    assert response.content == b""
+    assert response.headers["access-control-allow-origin"] == ORIGIN
+    assert response.headers["access-control-allow-methods"] == "DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+    assert response.headers["access-control-allow-headers"] == "authorization, content-type"
+    assert response.headers["access-control-allow-credentials"] == "true"
+    assert response.headers["access-control-max-age"] == "600"
+    assert response.headers["vary"] == "Origin"
+
+
+def test_simple_request_echoes_origin(client):
+    response = client.get("/ping", headers={"Origin": ORIGIN})
+
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+    assert response.headers["access-control-allow-origin"] == ORIGIN
+    assert response.headers["access-control-allow-credentials"] == "true"
+    assert response.headers["vary"] == "Origin"
+
+
+def test_request_without_origin_has_no_cors_headers(client):
+    response = client.get("/ping")
+
+    assert response.status_code == 200
+    assert not [name for name in response.headers if name.startswith("access-control-")]
+    assert "vary" not in response.headers
@@ -0,0 +1,27 @@
+"""
+Unit tests for query term extraction in the RAG service.
+"""
+import pytest
+
+from app.services.rag_service import _prepare_query
+
+
+@pytest.mark.parametrize("query, terms", [
+    ("How does e-commerce work?", ("e-commerce", "work")),
+    ("Explain node.js event loops.", ("node.js", "event", "loops")),
+    ("caching, debugging!", ("caching", "debugging")),
+    # Trailing punctuation no longer hides a stopword
+    ("what? python", ("python",)),
+    ("what's asyncio", ("asyncio",)),
+    # Words of one or two characters are dropped
+    ("is AI in ML useful", ("useful",)),
+    # Only stopwords: fall back to every word of three or more characters
+    ("what is the answer", ("what", "the", "answer")),
+])
+def test_prepare_query_terms(query, terms):
+    assert _prepare_query(query)[1] == terms
+
+
+def test_prepare_query_lowercases_and_strips():
+    assert _prepare_query("  Node.JS  ") == ("node.js", ("node.js",))
+    assert _prepare_query("") == ("", ())